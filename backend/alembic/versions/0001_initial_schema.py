@@ -0,0 +1,115 @@
+"""initial schema
+
+The tables as they stood before migrations were introduced. Databases created back then
+already match this revision and only need `alembic stamp 0001_initial_schema`.
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-17 09:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001_initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Frozen copies of app.models.enums, so later enum changes get their own revision
+user_type = sa.Enum('admin', 'user', 'guest', name='usertypeenum')
+classification_status = sa.Enum('success', 'failed', 'error', name='classificationstatusenum')
+audit_status = sa.Enum('success', 'failure', 'warning', 'info', name='auditstatusenum')
+action_type = sa.Enum(
+    'sign_up', 'sign_in', 'login', 'sign_out', 'mfa_verify', 'mfa_setup', 'email_verify',
+    'password_change', 'mfa_verification',
+    'created_user', 'updated_user', 'deleted_user', 'locked_user', 'unlocked_user',
+    'admin_create', 'admin_list', 'user_list',
+    'image_upload', 'image_validated', 'image_rejected', 'image_retrieval',
+    'classification_success', 'classification_failure', 'classification_history',
+    'admin_classification_history',
+    'audit_log_retrieval',
+    name='actiontypeenum'
+)
+
+def upgrade() -> None:
+    op.create_table(
+        'base_user',
+        sa.Column('user_id', sa.Integer(), primary_key=True),
+        sa.Column('username', sa.String(50), nullable=False, unique=True),
+        sa.Column('password_hash', sa.String(255), nullable=False),
+        sa.Column('email', sa.String(100), nullable=False, unique=True),
+        sa.Column('full_name', sa.Text(), nullable=False),
+        sa.Column('user_type', user_type, nullable=False),
+        sa.Column('mfa_enabled', sa.Boolean()),
+        sa.Column('totp_secret', sa.String(255)),
+        sa.Column('last_activity', sa.DateTime()),
+        sa.Column('active_status', sa.Boolean(), nullable=False),
+        sa.Column('login_attempts', sa.Integer(), nullable=False),
+        sa.Column('locked_until', sa.DateTime()),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('is_email_verified', sa.Boolean(), nullable=False),
+        sa.Column('email_verification_code', sa.String(6)),
+        sa.Column('email_verification_expires_at', sa.DateTime()),
+    )
+    op.create_table(
+        'role',
+        sa.Column('role_id', sa.Integer(), primary_key=True),
+        sa.Column('role_name', sa.String(50), nullable=False, unique=True),
+        sa.Column('description', sa.String()),
+    )
+    op.create_table(
+        'user_role',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('base_user.user_id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('role_id', sa.Integer(), sa.ForeignKey('role.role_id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('granted_at', sa.DateTime(), nullable=False),
+        sa.Column('granted_by', sa.Integer(), sa.ForeignKey('base_user.user_id', ondelete='SET NULL'), nullable=False),
+    )
+    op.create_table(
+        'audit_log',
+        sa.Column('log_id', sa.Integer(), primary_key=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('base_user.user_id', ondelete='SET NULL')),
+        sa.Column('ip_address', sa.String(45)),
+        sa.Column('user_agent', sa.Text()),
+        sa.Column('action', action_type, nullable=False),
+        sa.Column('resource', sa.String(100)),
+        sa.Column('status', audit_status, nullable=False),
+        sa.Column('details', sa.Text()),
+    )
+    op.create_table(
+        'image_classification',
+        sa.Column('classification_id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('base_user.user_id', ondelete='CASCADE'), nullable=False),
+        sa.Column('image_hash', sa.String(64), nullable=False),
+        sa.Column('image_path', sa.String(255)),
+        sa.Column('original_filename', sa.String(255)),
+        sa.Column('file_size', sa.Integer(), nullable=False),
+        sa.Column('classification_timestamp', sa.DateTime(), nullable=False),
+        sa.Column('model_used', sa.String(100), nullable=False),
+        sa.Column('top_prediction', sa.String(100)),
+        sa.Column('confidence_score', sa.Numeric(5, 2)),
+        sa.Column('process_time_ms', sa.Integer()),
+        sa.Column('status', classification_status, nullable=False),
+        sa.Column('encryption_salt', sa.String(32)),
+    )
+    op.create_table(
+        'classification_result',
+        sa.Column('result_id', sa.Integer(), primary_key=True),
+        sa.Column('classification_id', sa.Integer(),
+                  sa.ForeignKey('image_classification.classification_id', ondelete='CASCADE'), nullable=False),
+        sa.Column('class_name', sa.String(100), nullable=False),
+        sa.Column('confidence_score', sa.Numeric(5, 2), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+    )
+
+def downgrade() -> None:
+    op.drop_table('classification_result')
+    op.drop_table('image_classification')
+    op.drop_table('audit_log')
+    op.drop_table('user_role')
+    op.drop_table('role')
+    op.drop_table('base_user')
+    bind = op.get_bind()
+    for enum in (action_type, audit_status, classification_status, user_type):
+        enum.drop(bind, checkfirst=True)
@@ -0,0 +1,58 @@
+"""image blobs and hot-path indexes
+
+Adds the content-addressed blob table and one index per hot query: result-cache lookups by
+hash, per-user and admin history, the audit listing and segment compaction. On PostgreSQL
+the indexes on existing tables are built CONCURRENTLY, so uploads and audit writes keep
+going while they build.
+
+Revision ID: 0002_hot_path_indexes
+Revises: 0001_initial_schema
+Create Date: 2026-10-17 09:30:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002_hot_path_indexes'
+down_revision = '0001_initial_schema'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns), matching the Index entries in app.models
+INDEXES = [
+    ('ix_image_classification_hash_model', 'image_classification',
+     ['image_hash', 'model_used', 'classification_id']),
+    ('ix_image_classification_user_timestamp', 'image_classification',
+     ['user_id', 'classification_timestamp', 'classification_id']),
+    ('ix_image_classification_timestamp', 'image_classification',
+     ['classification_timestamp', 'classification_id']),
+    ('ix_image_classification_image_path', 'image_classification', ['image_path']),
+    ('ix_audit_log_timestamp', 'audit_log', ['timestamp', 'log_id']),
+]
+
+def upgrade() -> None:
+    op.create_table(
+        'image_blob',
+        sa.Column('blob_key', sa.String(64), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('base_user.user_id', ondelete='CASCADE'), nullable=False),
+        sa.Column('image_path', sa.String(255), nullable=False, unique=True),
+        sa.Column('file_size', sa.Integer(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        'ix_image_blob_image_path_pattern', 'image_blob', ['image_path'],
+        postgresql_ops={'image_path': 'varchar_pattern_ops'}
+    )
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    op.drop_index('ix_image_blob_image_path_pattern', table_name='image_blob')
+    op.drop_table('image_blob')
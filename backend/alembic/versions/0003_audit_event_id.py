@@ -0,0 +1,28 @@
+"""audit event ids
+
+The write-behind audit sink tags every event with an id, so replaying its spool after a
+crash or a timed-out batch never inserts an event twice. Rows written before this
+revision keep a NULL id.
+
+Revision ID: 0003_audit_event_id
+Revises: 0002_hot_path_indexes
+Create Date: 2026-10-17 11:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003_audit_event_id'
+down_revision = '0002_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('audit_log', sa.Column('event_id', sa.String(32)))
+    with op.get_context().autocommit_block():
+        op.create_index('ix_audit_log_event_id', 'audit_log', ['event_id'], unique=True, postgresql_concurrently=True)
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_audit_log_event_id', table_name='audit_log', postgresql_concurrently=True)
+    op.drop_column('audit_log', 'event_id')
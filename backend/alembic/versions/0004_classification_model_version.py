@@ -0,0 +1,37 @@
+"""classification model version
+
+Records the hash of the weights each classification was made with, and adds it to the
+result-cache index, so replacing a model file under the same name stops its old results
+from being reused. Rows written before this revision keep a NULL version and are never
+reused.
+
+Revision ID: 0004_classification_model_version
+Revises: 0003_audit_event_id
+Create Date: 2026-10-17 13:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004_classification_model_version'
+down_revision = '0003_audit_event_id'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('image_classification', sa.Column('model_version', sa.String(12)))
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_image_classification_hash_model', table_name='image_classification',
+                      postgresql_concurrently=True)
+        op.create_index('ix_image_classification_hash_model', 'image_classification',
+                        ['image_hash', 'model_used', 'model_version', 'classification_id'],
+                        postgresql_concurrently=True)
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_image_classification_hash_model', table_name='image_classification',
+                      postgresql_concurrently=True)
+        op.create_index('ix_image_classification_hash_model', 'image_classification',
+                        ['image_hash', 'model_used', 'classification_id'],
+                        postgresql_concurrently=True)
+    op.drop_column('image_classification', 'model_version')
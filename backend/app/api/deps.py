@@ -1,7 +1,7 @@
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 
 from ..db.session import get_db
@@ -14,7 +14,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}auth/login"
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     request: Request = None,
 ):
     credentials_exception = HTTPException(
@@ -54,7 +54,11 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(BaseUser).filter(BaseUser.user_id == user_id).first()
+    try:
+        # Identity-map hit when the security middleware already loaded this user
+        user = await db.get(BaseUser, int(user_id))
+    except ValueError:
+        raise credentials_exception
     if user is None:
         raise credentials_exception
 
@@ -64,8 +68,10 @@ async def get_current_user(
             detail="User is inactive"
         )
 
-    user.last_activity = datetime.now()
-    db.commit()
+    # Inside a request's unit of work the middleware records activity when it commits
+    if not db.info.get("unit_of_work"):
+        user.last_activity = datetime.now()
+        await db.commit()
 
     return user 
 
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from ...services.token import TokenRotationService
 from app.api.deps import get_current_admin, get_db
@@ -21,11 +21,11 @@ router = APIRouter()
 async def create_admin(
     admin: AdminCreate,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_admin)
 ):
     if admin.admin_creation_token != settings.ADMIN_CREATION_TOKEN:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.admin_create,
             user_id=current_user.user_id,
@@ -44,9 +44,9 @@ async def create_admin(
 
     try:
         # create the admin
-        result = AdminManagementService.create_admin(db, admin)
+        result = await AdminManagementService.create_admin(db, admin)
         
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.created_user,
             user_id=current_user.user_id,
@@ -59,7 +59,7 @@ async def create_admin(
         
         return result
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.created_user,
             user_id=current_user.user_id,
@@ -74,13 +74,13 @@ async def create_admin(
 @router.get("/list", response_model=List[AdminListResponse])
 async def list_admins(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_admin)
 ):
     try:
-        result = AdminManagementService.get_admin_list(db)
+        result = await AdminManagementService.get_admin_list(db)
         
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.admin_list,
             user_id=current_user.user_id,
@@ -93,7 +93,7 @@ async def list_admins(
         
         return result
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.admin_list,
             user_id=current_user.user_id,
@@ -110,13 +110,13 @@ async def update_admin(
     admin_id: int,
     admin: AdminUpdate,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_admin)
 ):
     try:
-        result = AdminManagementService.update_admin(db, admin_id, admin)
+        result = await AdminManagementService.update_admin(db, admin_id, admin)
         
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.updated_user,
             user_id=current_user.user_id,
@@ -130,7 +130,7 @@ async def update_admin(
         return result
     except Exception as e:
         # add audit log for failed admin update
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.updated_user,
             user_id=current_user.user_id,
@@ -1,25 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.deps import get_db, get_current_admin
 from app.models.base_user import BaseUser
-from app.services.audit_log import get_audit_logs, add_audit_log
+from app.services.audit_log import get_audit_logs, get_audit_log_version, add_audit_log
 from app.schemas.audi_log import AuditLogResponseList
 from app.models.enums import ActionTypeEnum, AuditStatusEnum
 from app.utils.security import get_device_info, get_client_ip
+from app.utils.conditional import REVALIDATE, etag_matches, listing_etag, not_modified
+from app.utils.pagination import TotalMode, decode_cursor
 
 router = APIRouter()
 
 @router.get("/list", response_model=AuditLogResponseList)
 async def list_audit_logs(
     request: Request,
+    response: Response,
     limit: int = 10,
     offset: int = 0,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    total: TotalMode = TotalMode.cached,
+    db: AsyncSession = Depends(get_db),
     current_user: BaseUser = Depends(get_current_admin)
 ):
     try:
         if not 1 <= limit <= 100:
-            add_audit_log(
+            await add_audit_log(
                 db=db,
                 action=ActionTypeEnum.audit_log_retrieval,
                 user_id=current_user.user_id,
@@ -35,7 +41,7 @@ async def list_audit_logs(
             )
         
         if offset < 0:
-            add_audit_log(
+            await add_audit_log(
                 db=db,
                 action=ActionTypeEnum.audit_log_retrieval,
                 user_id=current_user.user_id,
@@ -49,10 +55,33 @@ async def list_audit_logs(
                 status_code=400,
                 detail="Offset must be non-negative"
             )
+
+        if cursor is not None and offset:
+            await add_audit_log(
+                db=db,
+                action=ActionTypeEnum.audit_log_retrieval,
+                user_id=current_user.user_id,
+                ip_address=get_client_ip(request),
+                user_agent=get_device_info(request).get("user_agent"),
+                status=AuditStatusEnum.failure,
+                resource=f"Admin {current_user.user_id} {current_user.email} {current_user.username} attempted to retrieve audit logs",
+                details="Both cursor and offset were given"
+            )
+            raise HTTPException(
+                status_code=400,
+                detail="Use either cursor or offset, not both"
+            )
+
+        # Rejected with 400 here, before the success entry below is written
+        position = decode_cursor(cursor) if cursor is not None else None
             
-        result = get_audit_logs(db, limit=limit, offset=offset)
-        
-        add_audit_log(
+        etag = listing_etag("audit", limit, offset, cursor, total.value, await get_audit_log_version(db))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        # Logged before the version is taken, so it already counts this retrieval and the next
+        # unchanged poll gets a 304 instead of a page that differs only by its own entry
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.audit_log_retrieval,
             user_id=current_user.user_id,
@@ -60,12 +89,17 @@ async def list_audit_logs(
             user_agent=get_device_info(request).get("user_agent"),
             status=AuditStatusEnum.success,
             resource=f"Admin {current_user.user_id} {current_user.email} {current_user.username} retrieved audit logs",
-            details=f"Admin {current_user.user_id}, {current_user.email} successfully retrieved {limit} audit logs starting from offset {offset}"
+            details=f"Admin {current_user.user_id}, {current_user.email} successfully retrieved {limit} audit logs starting from "
+                    + (f"cursor {cursor}" if cursor is not None else f"offset {offset}")
         )
+        etag = listing_etag("audit", limit, offset, cursor, total.value, await get_audit_log_version(db))
+        result = await get_audit_logs(db, limit=limit, offset=offset, cursor=position, total=total)
         
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = REVALIDATE
         return result
     except HTTPException as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.audit_log_retrieval,
             user_id=current_user.user_id,
@@ -77,7 +111,7 @@ async def list_audit_logs(
         )
         raise
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.audit_log_retrieval,
             user_id=current_user.user_id,
@@ -4,7 +4,7 @@ This file contains authentication routes
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta, datetime, timezone
 
 from ...db.session import get_db
@@ -25,13 +25,13 @@ router = APIRouter()
 @router.post("/signup", response_model=UserSignupResponse)
 async def signup(
     user_data: UserSignup,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     request: Request = None
 ):
     try:
-        user = AuthService.create_user(db, user_data)
+        user = await AuthService.create_user(db, user_data)
         
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.sign_up,
             user_id=user.user_id,
@@ -48,7 +48,7 @@ async def signup(
         }
     
     except HTTPException as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.sign_up,
             user_id=None,
@@ -61,7 +61,7 @@ async def signup(
 
         raise e
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.sign_up,
             user_id=None,
@@ -80,16 +80,16 @@ async def signup(
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     request: Request = None
 ):
     try:
-        user = AuthService.authenticate_user(db, 
+        user = await AuthService.authenticate_user(db, 
                                             form_data.username, 
                                             form_data.password)
         
         if not user:
-            add_audit_log(
+            await add_audit_log(
                 db=db,
                 action=ActionTypeEnum.login,
                 user_id=None,
@@ -108,7 +108,7 @@ async def login(
             
         
         if user.mfa_enabled:
-            add_audit_log(
+            await add_audit_log(
                 db=db,
                 action=ActionTypeEnum.login,
                 user_id=user.user_id,
@@ -142,7 +142,7 @@ async def login(
             context_data=context_data
         )
 
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.login,
             user_id=user.user_id,
@@ -161,7 +161,7 @@ async def login(
             "is_email_verified": user.is_email_verified
         }
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.login,
             user_id=None,
@@ -179,12 +179,12 @@ async def login(
 @router.post("/verify-mfa", response_model=Token)
 async def verify_mfa(
     mfa_data: MFAVerify,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     request: Request = None
 ):
     try:
-        if not MFAService.verify_mfa(db, mfa_data.user_id, mfa_data.token):
-            add_audit_log(
+        if not await MFAService.verify_mfa(db, mfa_data.user_id, mfa_data.token):
+            await add_audit_log(
                 db=db,
                 action=ActionTypeEnum.mfa_verify,
                 user_id=mfa_data.user_id,
@@ -201,9 +201,9 @@ async def verify_mfa(
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        user = db.query(BaseUser).filter(BaseUser.user_id == mfa_data.user_id).first()
+        user = await db.get(BaseUser, mfa_data.user_id)
         if not user:
-            add_audit_log(
+            await add_audit_log(
                 db=db,
                 action=ActionTypeEnum.mfa_verify,
                 user_id=mfa_data.user_id,
@@ -234,7 +234,7 @@ async def verify_mfa(
             context_data=context_data
         )
 
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.mfa_verify,
             user_id=user.user_id,
@@ -253,7 +253,7 @@ async def verify_mfa(
             "is_email_verified": user.is_email_verified
         }
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.mfa_verify,
             user_id=mfa_data.user_id,
@@ -271,12 +271,12 @@ async def verify_mfa(
 @router.post("/send-verification-email")
 async def send_verification_email(
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     request: Request = None
 ):
     try:
         if current_user.is_email_verified:
-            add_audit_log(
+            await add_audit_log(
                 db=db,
                 action=ActionTypeEnum.email_verify,
                 user_id=current_user.user_id,
@@ -292,9 +292,9 @@ async def send_verification_email(
                 detail="Email already verified"
             )
         
-        EmailService.initiate_verification(db, current_user.user_id)
+        await EmailService.initiate_verification(db, current_user.user_id)
 
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.email_verify,
             user_id=current_user.user_id,
@@ -307,7 +307,7 @@ async def send_verification_email(
 
         return {"message": "Verification email sent"}
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.email_verify,
             user_id=current_user.user_id,
@@ -326,7 +326,7 @@ async def send_verification_email(
 async def verify_email(
     email_data: EmailVerify,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     request: Request = None
 ):
     """
@@ -334,7 +334,7 @@ async def verify_email(
     """
     try:
         if current_user.is_email_verified:
-            add_audit_log(
+            await add_audit_log(
                 db=db,
                 action=ActionTypeEnum.email_verify,
                 user_id=current_user.user_id,
@@ -350,8 +350,8 @@ async def verify_email(
                 detail="Email already verified"
             )
         
-        if not EmailService.verify_email(db, current_user.user_id, email_data.code):
-            add_audit_log(
+        if not await EmailService.verify_email(db, current_user.user_id, email_data.code):
+            await add_audit_log(
                 db=db,
                 action=ActionTypeEnum.email_verify,
                 user_id=current_user.user_id,
@@ -367,7 +367,7 @@ async def verify_email(
                 detail="Invalid or expired verification code"
             )
         
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.email_verify,
             user_id=current_user.user_id,
@@ -380,7 +380,7 @@ async def verify_email(
         
         return {"message": "Email verified successfully"}
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.email_verify,
             user_id=current_user.user_id,
@@ -398,13 +398,13 @@ async def verify_email(
 @router.post("/setup-mfa", response_model=MFASetupResponse)
 async def setup_mfa(
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     request: Request = None
 ):
     try:
-        mfa_setup = MFAService.setup_mfa(db, current_user.user_id)
+        mfa_setup = await MFAService.setup_mfa(db, current_user.user_id)
         if not mfa_setup:
-            add_audit_log(
+            await add_audit_log(
                 db=db,
                 action=ActionTypeEnum.mfa_setup,
                 user_id=current_user.user_id,
@@ -420,7 +420,7 @@ async def setup_mfa(
                 detail="Failed to setup MFA"
             )
 
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.mfa_setup,
             user_id=current_user.user_id,
@@ -433,7 +433,7 @@ async def setup_mfa(
 
         return mfa_setup
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.mfa_setup,
             user_id=current_user.user_id,
@@ -451,12 +451,12 @@ async def setup_mfa(
 @router.post("/verify-mfa-setup")
 async def verify_mfa_setup(
     mfa_data: MFAVerify,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     request: Request = None
 ):
     try:
-        if not MFAService.verify_mfa_setup(db, mfa_data.user_id, mfa_data.token):
-            add_audit_log(
+        if not await MFAService.verify_mfa_setup(db, mfa_data.user_id, mfa_data.token):
+            await add_audit_log(
                 db=db,
                 action=ActionTypeEnum.mfa_setup,
                 user_id=mfa_data.user_id,
@@ -472,7 +472,7 @@ async def verify_mfa_setup(
                 detail="Invalid MFA token",
             )
         
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.mfa_setup,
             user_id=mfa_data.user_id,
@@ -487,7 +487,7 @@ async def verify_mfa_setup(
             "message": "MFA setup verified successfully"
         }
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.mfa_setup,
             user_id=mfa_data.user_id,
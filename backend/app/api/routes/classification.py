@@ -1,17 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
-from fastapi.responses import Response
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Header, Request
+from fastapi.responses import Response, StreamingResponse
+from typing import List, Optional
 from datetime import datetime
-from sqlalchemy.orm import Session
+from urllib.parse import unquote
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.deps import get_db, get_current_user, get_current_admin
 from app.models.base_user import BaseUser
 from app.models.image_classification import ImageClassification
-from app.schemas.classification import ClassificationHistory, ClassificationResponse, ClassificationHistoryAdminResponse
-from ...services.classification_service import ClassificationService
+from app.schemas.classification import ClassificationHistory, ClassificationResponse, ClassificationHistoryAdminResponse, BatchClassificationResponse
+from app.core.config import settings
+from ...services.classification_service import ClassificationService, iter_file_uploads, iter_archive_upload
 from ...services.image_storage_service import ImageStorageService
 from app.services.audit_log import add_audit_log
-from app.models.enums import ActionTypeEnum, AuditStatusEnum, ClassificationStatusEnum
+from app.models.enums import ActionTypeEnum, AuditStatusEnum, ClassificationStatusEnum, UserTypeEnum
 from app.utils.security import get_device_info, get_client_ip
+from app.utils.upload import ingest_stream
+from app.utils.http_range import parse_range, RangeNotSatisfiableError
+from app.utils.conditional import REVALIDATE, etag_matches, listing_etag, not_modified
+from app.utils.pagination import TotalMode
+from app.services.encryption_service import StoredImage
+from app.services.storage_io import storage_io
+from app.services.thumbnail_service import ThumbnailService
 
 router = APIRouter()
 
@@ -19,13 +28,13 @@ router = APIRouter()
 async def classify(
     request: Request,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: BaseUser = Depends(get_current_user)
 ):
     try:
         result = await ClassificationService(db).process_image(file, current_user.user_id)
         print(result) 
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.image_upload,
             user_id=current_user.user_id,
@@ -37,8 +46,78 @@ async def classify(
         )
         
         return result
+    except HTTPException as e:
+        await add_audit_log(
+            db=db,
+            action=ActionTypeEnum.image_upload,
+            user_id=current_user.user_id,
+            ip_address=get_client_ip(request),
+            user_agent=get_device_info(request).get("user_agent"),
+            status=AuditStatusEnum.failure,
+            resource=f"User {current_user.user_id} failed to classify image",
+            details=str(e)
+        )
+        raise e
+    except Exception as e:
+        await add_audit_log(
+            db=db,
+            action=ActionTypeEnum.image_upload,
+            user_id=current_user.user_id,
+            ip_address=get_client_ip(request),
+            user_agent=get_device_info(request).get("user_agent"),
+            status=AuditStatusEnum.failure,
+            resource=f"User {current_user.user_id} failed to classify image",
+            details=str(e)
+        )
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/classify-raw", response_model=ClassificationResponse)
+async def classify_raw(
+    request: Request,
+    x_filename: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: BaseUser = Depends(get_current_user)
+):
+    """Classify an image sent as a raw application/octet-stream body, with the name in X-Filename"""
+    try:
+        content_type = request.headers.get("content-type", "")
+        if content_type.split(";")[0].strip() != "application/octet-stream":
+            raise HTTPException(status_code=415, detail="Request body must be application/octet-stream")
+
+        content_length = request.headers.get("content-length")
+        if content_length is not None and int(content_length) > settings.MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds the {settings.MAX_UPLOAD_BYTES} byte limit")
+
+        filename = unquote(x_filename) if x_filename else None
+        with await ingest_stream(request.stream()) as upload:
+            result = await ClassificationService(db).process_upload(upload, filename, current_user.user_id)
+
+        await add_audit_log(
+            db=db,
+            action=ActionTypeEnum.image_upload,
+            user_id=current_user.user_id,
+            ip_address=get_client_ip(request),
+            user_agent=get_device_info(request).get("user_agent"),
+            status=AuditStatusEnum.success,
+            resource=f"User {current_user.user_id} uploaded and classified image",
+            details=f"User {current_user.user_id}, {current_user.email} successfully classified image with result: {result.top_prediction} (confidence: {result.confidence_score:.2f})"
+        )
+
+        return result
+    except HTTPException as e:
+        await add_audit_log(
+            db=db,
+            action=ActionTypeEnum.image_upload,
+            user_id=current_user.user_id,
+            ip_address=get_client_ip(request),
+            user_agent=get_device_info(request).get("user_agent"),
+            status=AuditStatusEnum.failure,
+            resource=f"User {current_user.user_id} failed to classify image",
+            details=str(e)
+        )
+        raise e
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.image_upload,
             user_id=current_user.user_id,
@@ -50,17 +129,81 @@ async def classify(
         )
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/classify-batch", response_model=BatchClassificationResponse)
+async def classify_batch(
+    request: Request,
+    files: Optional[List[UploadFile]] = File(None),
+    archive: Optional[UploadFile] = File(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: BaseUser = Depends(get_current_user)
+):
+    try:
+        if (files is None) == (archive is None):
+            raise HTTPException(status_code=400, detail="Provide either a list of files or a single tar/zip archive")
+
+        if files is not None and len(files) > settings.BATCH_MAX_IMAGES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch exceeds the limit of {settings.BATCH_MAX_IMAGES} images"
+            )
+
+        items = iter_archive_upload(archive) if archive is not None else iter_file_uploads(files)
+        result = await ClassificationService(db).process_batch(items, current_user.user_id)
+
+        await add_audit_log(
+            db=db,
+            action=ActionTypeEnum.image_upload,
+            user_id=current_user.user_id,
+            ip_address=get_client_ip(request),
+            user_agent=get_device_info(request).get("user_agent"),
+            status=AuditStatusEnum.success if result.failed == 0 else AuditStatusEnum.warning,
+            resource=f"User {current_user.user_id} uploaded and classified a batch of {result.total} images",
+            details=f"User {current_user.user_id}, {current_user.email} classified {result.succeeded} of {result.total} images in a batch ({result.failed} failed)"
+        )
+
+        return result
+    except HTTPException as e:
+        await add_audit_log(
+            db=db,
+            action=ActionTypeEnum.image_upload,
+            user_id=current_user.user_id,
+            ip_address=get_client_ip(request),
+            user_agent=get_device_info(request).get("user_agent"),
+            status=AuditStatusEnum.failure,
+            resource=f"User {current_user.user_id} failed to classify a batch of images",
+            details=str(e)
+        )
+        raise e
+    except Exception as e:
+        await add_audit_log(
+            db=db,
+            action=ActionTypeEnum.image_upload,
+            user_id=current_user.user_id,
+            ip_address=get_client_ip(request),
+            user_agent=get_device_info(request).get("user_agent"),
+            status=AuditStatusEnum.failure,
+            resource=f"User {current_user.user_id} failed to classify a batch of images",
+            details=str(e)
+        )
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/history", response_model=List[ClassificationHistory])
 async def get_history(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     current_user: BaseUser = Depends(get_current_user)
 ):
     try:
         service = ClassificationService(db)
-        history = service.get_classification_history(current_user.user_id)
+        # Versioned before the listing query, so a racing insert can only cause an extra 200
+        etag = listing_etag("history", current_user.user_id, await service.get_history_version(current_user.user_id))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        history = await service.get_classification_history(current_user.user_id)
         
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.classification_history,
             user_id=current_user.user_id,
@@ -71,9 +214,11 @@ async def get_history(
             details=f"User {current_user.user_id}, {current_user.email} successfully retrieved their classification history"
         )
         
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = REVALIDATE
         return history
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.classification_history,
             user_id=current_user.user_id,
@@ -88,16 +233,23 @@ async def get_history(
 @router.get("/history-all", response_model=ClassificationHistoryAdminResponse)
 async def get_all_history(
     request: Request,
+    response: Response,
     limit: int = 10,
     offset: int = 0,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    total: TotalMode = TotalMode.cached,
+    db: AsyncSession = Depends(get_db),
     current_user: BaseUser = Depends(get_current_admin)
 ):
     try:
         service = ClassificationService(db)
-        history = service.get_all_classification_history(limit=limit, offset=offset)
+        etag = listing_etag("history-all", limit, offset, cursor, total.value, await service.get_history_version())
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        history = await service.get_all_classification_history(limit=limit, offset=offset, cursor=cursor, total=total)
         
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.admin_classification_history,
             user_id=current_user.user_id,
@@ -108,9 +260,11 @@ async def get_all_history(
             details=f"Admin {current_user.user_id}, {current_user.email} successfully retrieved all classification history"
         )
         
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = REVALIDATE
         return history
     except HTTPException as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.admin_classification_history,
             user_id=current_user.user_id,
@@ -122,7 +276,7 @@ async def get_all_history(
         )
         raise e
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.admin_classification_history,
             user_id=current_user.user_id,
@@ -137,20 +291,62 @@ async def get_all_history(
             detail=f"Failed to fetch classification history: {str(e)}"
         )
         
+@router.get("/image/{classification_id}/thumbnail")
+async def get_thumbnail(
+    request: Request,
+    classification_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: BaseUser = Depends(get_current_user)
+):
+    """Small WebP preview for history views; not audited per view, unlike the full image"""
+    try:
+        classification = await db.get(ImageClassification, classification_id)
+
+        if not classification or not classification.image_path or (
+            classification.user_id != current_user.user_id and current_user.user_type != UserTypeEnum.admin
+        ):
+            raise HTTPException(status_code=404, detail="Image not found")
+
+        # Previews are derived from immutable content, so the hash is a strong validator
+        headers = {
+            "ETag": f'"{classification.image_hash}-{settings.THUMBNAIL_SIZE}"',
+            "Cache-Control": "private, max-age=31536000, immutable"
+        }
+        if etag_matches(request, headers["ETag"]):
+            return not_modified(headers["ETag"], headers["Cache-Control"])
+
+        thumbnail = await ThumbnailService(db).get_thumbnail(classification)
+        return Response(content=thumbnail, media_type="image/webp", headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in get_thumbnail: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _stream_image(image: StoredImage, start: int, end: int):
+    # Each chunk is read and decrypted in the storage I/O pool
+    chunks = image.iter_range(start, end)
+    try:
+        while True:
+            chunk = await storage_io.run("read", next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        image.close()
+
 @router.get("/image/{classification_id}")
 async def get_image(
     request: Request,
     classification_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: BaseUser = Depends(get_current_user)
 ):
     try:
-        classification = db.query(ImageClassification).filter(
-            ImageClassification.classification_id == classification_id
-        ).first()
+        classification = await db.get(ImageClassification, classification_id)
         
         if not classification:
-            add_audit_log(
+            await add_audit_log(
                 db=db,
                 action=ActionTypeEnum.image_retrieval,
                 user_id=current_user.user_id,
@@ -162,9 +358,40 @@ async def get_image(
             )
             raise HTTPException(status_code=404, detail="Image not found")
         
-        image_data = ImageStorageService(db).get_decrypted_image(classification_id)
+        # Stored content never changes under a hash, so a match skips the read and decrypt
+        etag = f'"{classification.image_hash}"'
+        if etag_matches(request, etag):
+            # Revalidated retrievals are still retrievals, so they are audited like full ones
+            await add_audit_log(
+                db=db,
+                action=ActionTypeEnum.image_retrieval,
+                user_id=current_user.user_id,
+                ip_address=get_client_ip(request),
+                user_agent=get_device_info(request).get("user_agent"),
+                status=AuditStatusEnum.success,
+                resource=f"User {current_user.user_id} retrieved image",
+                details=f"User {current_user.user_id}, {current_user.email} successfully revalidated cached image {classification_id} (304 Not Modified)"
+            )
+            return not_modified(etag)
+
+        image = await ImageStorageService(db).open_image(classification_id)
+        try:
+            byte_range = parse_range(request.headers.get("range"), image.size)
+        except RangeNotSatisfiableError as e:
+            image.close()
+            await add_audit_log(
+                db=db,
+                action=ActionTypeEnum.image_retrieval,
+                user_id=current_user.user_id,
+                ip_address=get_client_ip(request),
+                user_agent=get_device_info(request).get("user_agent"),
+                status=AuditStatusEnum.failure,
+                resource=f"User {current_user.user_id} failed to retrieve image",
+                details=str(e)
+            )
+            raise HTTPException(status_code=416, detail=str(e), headers={"Content-Range": f"bytes */{image.size}"})
         
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.image_retrieval,
             user_id=current_user.user_id,
@@ -175,12 +402,27 @@ async def get_image(
             details=f"User {current_user.user_id}, {current_user.email} successfully retrieved image {classification_id}"
         )
         
-        return Response(
-            content=image_data,
-            media_type="image/jpeg"
+        # Chunked files are decrypted chunk by chunk while the response streams
+        start, end = byte_range or (0, image.size - 1)
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Content-Length": str(end - start + 1),
+            "ETag": etag,
+            "Cache-Control": REVALIDATE
+        }
+        if byte_range:
+            headers["Content-Range"] = f"bytes {start}-{end}/{image.size}"
+
+        return StreamingResponse(
+            _stream_image(image, start, end),
+            status_code=206 if byte_range else 200,
+            media_type="image/jpeg",
+            headers=headers
         )
+    except HTTPException:
+        raise
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.image_retrieval,
             user_id=current_user.user_id,
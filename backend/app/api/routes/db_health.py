@@ -1,14 +1,38 @@
 from fastapi import FastAPI, Depends, APIRouter
-from sqlalchemy.orm import Session
-from ...db.session import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...db.session import async_engine, engine, get_db, pool_stats
 from sqlalchemy import text
+from ..deps import get_current_admin
+from ...models.base_user import BaseUser
+from ...services.audit_sink import audit_sink
+from ...services.result_cache import result_cache
+from ...services.storage_io import storage_io
+from ...services.thumbnail_service import thumbnail_cache
 router = APIRouter()
 
 
 @router.get("/health", tags=["health"])
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(get_db)):
     try:
-        result = db.execute(text("SELECT 1")).scalar()
+        result = (await db.execute(text("SELECT 1"))).scalar()
         return {"db_status": "connected" if result == 1 else "disconnected"}
     except Exception as e:
         return {"db_status": "disconnected", "error": str(e)}
+
+# Only the liveness check above is public; the stats below are for admins
+
+@router.get("/cache", tags=["health"])
+async def cache_stats(current_user: BaseUser = Depends(get_current_admin)):
+    return {**result_cache.stats(), "thumbnails": thumbnail_cache.stats()}
+
+@router.get("/storage", tags=["health"])
+async def storage_stats(current_user: BaseUser = Depends(get_current_admin)):
+    return storage_io.stats()
+
+@router.get("/pool", tags=["health"])
+async def database_pool_stats(current_user: BaseUser = Depends(get_current_admin)):
+    return {"requests": pool_stats(async_engine.sync_engine), "background": pool_stats(engine)}
+
+@router.get("/audit", tags=["health"])
+async def audit_sink_stats(current_user: BaseUser = Depends(get_current_admin)):
+    return audit_sink.stats()
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.api.deps import get_current_admin, get_db
 from app.schemas.user_management import (
@@ -17,13 +17,13 @@ router = APIRouter()
 @router.get("/list", response_model=List[UserListResponse])
 async def list_users(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_admin)
 ):
     try:
-        result = UserManagementService.get_user_list(db)
+        result = await UserManagementService.get_user_list(db)
         
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.user_list,
             user_id=current_user.user_id,
@@ -36,7 +36,7 @@ async def list_users(
         
         return result
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.user_list,
             user_id=current_user.user_id,
@@ -53,14 +53,14 @@ async def update_user(
     user_id: int,
     user: UserUpdate,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_admin)
 ):
  
     try:
-        result = UserManagementService.update_user(db, user_id, user)
+        result = await UserManagementService.update_user(db, user_id, user)
         
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.updated_user,
             user_id=current_user.user_id,
@@ -73,7 +73,7 @@ async def update_user(
         
         return result
     except Exception as e:
-        add_audit_log(
+        await add_audit_log(
             db=db,
             action=ActionTypeEnum.updated_user,
             user_id=current_user.user_id,
@@ -83,4 +83,4 @@ async def update_user(
             resource=f"Admin {current_user.user_id}, {current_user.email} failed to update user {user_id}",
             details=str(e)
         )
-        raise 
\ No newline at end of file
+        raise 
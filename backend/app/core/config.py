@@ -5,7 +5,7 @@ from pathlib import Path
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 import os
-from typing import List
+from typing import List, Optional
 
 # Create path for .env file
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -31,6 +31,13 @@ class Settings(BaseSettings):
     DB_HOST: str
     DB_PORT: str
     DB_NAME: str
+    DB_REQUEST_STATS: bool = False  # X-DB-Queries / X-DB-Commits response headers
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds, below server and proxy idle timeouts
+    DB_POOL_PRE_PING: bool = True
+    LISTING_COUNT_TTL_SECONDS: float = 30.0  # how long a cached listing total is served
 
     # Session settings
     RATE_LIMIT_PER_MINUTE: int
@@ -46,11 +53,68 @@ class Settings(BaseSettings):
     SENDGRID_FROM_EMAIL: str = "noreply@image-classification.com"
     SENDGRID_FROM_NAME: str = "Image Classification"
 
+    # Inference settings
+    DEFAULT_MODEL: str = "cifar10_resnet20"
+    MODEL_VARIANTS: List[str] = []  # bnfold | int8_dynamic (fc head only) | int8_static (whole network, calibrated offline)
+    INFERENCE_BACKEND: str = "eager"  # eager | torchscript | compile | onnxruntime
+    INFERENCE_BENCHMARK_ON_STARTUP: bool = False
+    INFERENCE_MAX_BATCH_SIZE: int = 32
+    INFERENCE_MAX_WAIT_MS: float = 5.0
+    INFERENCE_EXECUTOR: str = "thread"  # thread | process
+    INFERENCE_WORKERS: int = 1
+    INFERENCE_INTRA_OP_THREADS: int = 0  # 0 keeps torch's default
+    INFERENCE_MAX_QUEUE_DEPTH: int = 256
+    ONNX_INTRA_OP_THREADS: int = 0  # 0 lets onnxruntime decide
+    ONNX_INTER_OP_THREADS: int = 0
+    ONNX_GRAPH_OPTIMIZATION_LEVEL: str = "all"  # disable | basic | extended | all
+    RESULT_CACHE_MAX_ENTRIES: int = 10000
+    RESULT_CACHE_TTL_SECONDS: float = 3600.0
+
+    # Image upload settings
+    MAX_IMAGE_PIXELS: int = 40_000_000
+    ALLOWED_IMAGE_FORMATS: List[str] = ["JPEG", "PNG", "WEBP", "BMP", "GIF"]
+    IMAGE_DRAFT_DECODE: bool = True
+    MAX_UPLOAD_BYTES: int = 20 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 64 * 1024
+    UPLOAD_SPOOL_BYTES: int = 1024 * 1024  # larger bodies spill to a temp file
+    BATCH_MAX_IMAGES: int = 5000
+
+    # Image storage settings
+    IMAGE_MASTER_KEY: str  # required; rotating it orphans stored images (was SECRET_KEY before it existed)
+    IMAGE_KEK_CACHE_TTL_SECONDS: int = 900
+    IMAGE_KEK_CACHE_MAX_ENTRIES: int = 10000
+    IMAGE_CHUNK_BYTES: int = 64 * 1024  # plaintext bytes per independently authenticated chunk
+    STORAGE_IO_WORKERS: int = 8
+    STORAGE_FSYNC_POLICY: str = "none"  # none | file | batched
+    STORAGE_FSYNC_BATCH_MS: float = 50.0
+    STORAGE_ENGINE: str = "files"  # files | segments
+    SEGMENT_MAX_BYTES: int = 256 * 1024 * 1024
+    SEGMENT_MAX_BLOB_BYTES: int = 256 * 1024  # larger images always get their own file
+    SEGMENT_SEAL_IDLE_SECONDS: float = 600.0
+    SEGMENT_COMPACT_INTERVAL_SECONDS: float = 900.0
+    SEGMENT_COMPACT_MIN_DEAD_RATIO: float = 0.3
+
+    # Audit log settings
+    AUDIT_WRITE_BEHIND: bool = True  # otherwise each event is written in the request's transaction
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_MS: float = 500.0
+    AUDIT_FLUSH_TIMEOUT_SECONDS: float = 5.0  # slower batches stay in the spool and are retried
+    AUDIT_SPOOL_FSYNC: bool = True  # the spool is the only copy of an accepted event; STORAGE_FSYNC_POLICY doesn't apply
+
+    # Thumbnail settings
+    THUMBNAIL_SIZE: int = 128
+    THUMBNAIL_QUALITY: int = 80
+    THUMBNAIL_ON_UPLOAD: bool = False  # otherwise rendered on first request
+    THUMBNAIL_CACHE_BYTES: int = 32 * 1024 * 1024
 
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+
     class Config:
         env_file = ENV_PATH
         case_sensitive = True
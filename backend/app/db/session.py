@@ -1,19 +1,118 @@
 """
 This file contains database engine
 """
+import time
+from contextvars import ContextVar
+from typing import Optional
 
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from ..core.config import settings
+from ..services.storage_io import OperationStats
 
-engine = create_engine(settings.DATABASE_URL)
+def _timed(pool_class):
+    class TimedPool(pool_class):
+        """Pool that records how long each checkout waited, including timeouts"""
+
+        def __init__(self, *args, max_overflow: int = 10, **kwargs):
+            super().__init__(*args, max_overflow=max_overflow, **kwargs)
+            self.max_overflow = max_overflow
+            self.checkout_stats = OperationStats()
+
+        def connect(self):
+            start = time.perf_counter()
+            timed_out = False
+            try:
+                return super().connect()
+            except exc.TimeoutError:
+                timed_out = True
+                raise
+            finally:
+                self.checkout_stats.record((time.perf_counter() - start) * 1000, timed_out)
+
+    return TimedPool
+
+POOL_OPTIONS = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
+
+# Blocking engine, for work that already runs in a thread (segment compaction, scripts)
+engine = create_engine(settings.DATABASE_URL, poolclass=_timed(QueuePool), **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Request handlers await the database instead of blocking the event loop
+async_engine = create_async_engine(settings.ASYNC_DATABASE_URL, poolclass=_timed(AsyncAdaptedQueuePool), **POOL_OPTIONS)
+# Nothing can lazy-load in an async session, so loaded objects stay usable after commit
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+class QueryStats:
+    """Statements and commits issued while handling one request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.commits = 0
+
+request_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("request_query_stats", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    stats = request_query_stats.get()
+    if stats is not None:
+        stats.queries += 1
+
+@event.listens_for(Engine, "commit")
+def _count_commit(conn):
+    stats = request_query_stats.get()
+    if stats is not None:
+        stats.commits += 1
+
+def pool_stats(bind: Engine) -> dict:
+    pool = bind.pool
+    stats = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        # Negative until the pool has opened pool_size connections
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": getattr(pool, "max_overflow", None),
+        "timeout_s": pool.timeout(),
+    }
+    checkout_stats = getattr(pool, "checkout_stats", None)
+    if checkout_stats is not None:
+        snapshot = checkout_stats.snapshot()
+        snapshot["timeouts"] = snapshot.pop("errors")
+        stats["checkout"] = snapshot
+    return stats
+
+def begin_unit_of_work() -> AsyncSession:
+    """Session shared by the middleware, dependencies and services of one request, committed once at its end"""
+    db = AsyncSessionLocal()
+    db.info["unit_of_work"] = True
+    return db
+
+async def commit_or_flush(db: AsyncSession) -> None:
+    """Flush inside a request's unit of work, which commits later; commit a standalone session"""
+    if db.info.get("unit_of_work"):
+        await db.flush()
+    else:
+        await db.commit()
+
+async def get_db(request: Request):
+    db = getattr(request.state, "db", None)
+    if db is not None:
+        # Owned by the middleware, which commits and closes it
+        yield db
+        return
+
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -1,17 +1,51 @@
 # app/main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .core.config import settings
+from .db.session import async_engine
+from .services.model_registry import model_registry
+from .services.inference_scheduler import inference_scheduler
+from .services.inference_executor import inference_executor
+from .services.result_cache import result_cache
+from .services.storage_io import storage_io
+from .services.audit_sink import audit_sink
+from .services.segment_store import segment_store, run_compactor
 from .middleware.security import SecurityMiddleware
 from .api.routes import auth, db_health, classification, admin_management, user_management, audit_log
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load model weights once per worker instead of once per request
+    model_registry.load_all()
+    app.state.model_registry = model_registry
+    inference_executor.start()
+    storage_io.start()
+    if settings.AUDIT_WRITE_BEHIND:
+        await audit_sink.start()
+    compactor = asyncio.create_task(run_compactor()) if settings.STORAGE_ENGINE == "segments" else None
+    yield
+    if compactor is not None:
+        compactor.cancel()
+    await inference_scheduler.stop()
+    inference_executor.shutdown()
+    await audit_sink.close()
+    segment_store.close()
+    storage_io.shutdown()
+    await async_engine.dispose()
+    model_registry.clear()
+    result_cache.clear()
+
+
 app = FastAPI(
     title="Image Classification System",
     description='Image Classification System with Zero Trust Security',
     version="0.1.0",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 
@@ -7,10 +7,12 @@ from datetime import datetime, timedelta
 import time
 from collections import defaultdict
 import jwt
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..core.config import settings
 from ..utils.token import decode_token
-from ..db.session import SessionLocal
+from ..db.session import QueryStats, begin_unit_of_work, request_query_stats
 from ..models.base_user import BaseUser
 
 class SecurityMiddleware(BaseHTTPMiddleware):
@@ -43,10 +45,43 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         
         self.request_counts[client_ip].append(current_time)
 
+        # One session and one transaction for the whole request; dependencies reuse it via request.state
+        stats = QueryStats()
+        request_query_stats.set(stats)
+        db = begin_unit_of_work()
+        request.state.db = db
+        try:
+            user = await self._validate_session(request, db)
+            # End the read-only transaction, so no pooled connection is held while the body uploads.
+            # Rolled back since it wrote nothing; the user is kept out of it, as a rollback would
+            # expire it and the dependencies would load it again
+            if user is not None:
+                db.expunge(user)
+            await db.rollback()
+            if user is not None:
+                db.add(user)
+            response = await call_next(request)
+
+            # Written last, so the user row is not locked while the request runs
+            if user is not None:
+                user.last_activity = datetime.now()
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+        finally:
+            await db.close()
+
+        if settings.DB_REQUEST_STATS:
+            response.headers["X-DB-Queries"] = str(stats.queries)
+            response.headers["X-DB-Commits"] = str(stats.commits)
+        return response
+
+    async def _validate_session(self, request: Request, db: AsyncSession) -> Optional[BaseUser]:
         # Session management
         authorization = request.headers.get("Authorization")
         if not authorization or not authorization.startswith("Bearer"):
-            return await call_next(request)
+            return None
         
         token = authorization.replace("Bearer", "").strip()
 
@@ -63,31 +98,24 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                 )
 
             # User session validation
-            db = SessionLocal()
-            try:
-                user = db.query(BaseUser).filter(BaseUser.user_id == user_id).first()
-                if not user:
+            user = await db.get(BaseUser, user_id)
+            if not user:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="User not found"
+                )
+
+            if user.last_activity:
+                inactivity_time = datetime.now() - user.last_activity
+                if inactivity_time > timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES):
                     raise HTTPException(
                         status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="User not found"
+                        detail="Session expired due to inactivity"
                     )
-
-                if user.last_activity:
-                    inactivity_time = datetime.now() - user.last_activity
-                    if inactivity_time > timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES):
-                        raise HTTPException(
-                            status_code=status.HTTP_401_UNAUTHORIZED,
-                            detail="Session expired due to inactivity"
-                        )
-                
-                user.last_activity = datetime.now()
-                db.commit()
-            finally:
-                db.close()
         except jwt.PyJWTError as e:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token"
             )
 
-        return await call_next(request) 
\ No newline at end of file
+        return user
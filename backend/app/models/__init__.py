@@ -8,6 +8,7 @@ from .enums import (
     ActionTypeEnum,
     ClassificationStatusEnum
 )
+from .image_blob import ImageBlob
 from .image_classification import ImageClassification
 from .role import Role
 from .user_role import UserRole
@@ -21,6 +22,7 @@ __all__ = [
     'AuditStatusEnum',
     'ActionTypeEnum',
     'ClassificationStatusEnum',
+    'ImageBlob',
     'ImageClassification',
     'Role',
     'UserRole',
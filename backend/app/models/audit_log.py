@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Text, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .base import Base
@@ -6,7 +6,13 @@ from .enums import ActionTypeEnum, AuditStatusEnum
 
 class AuditLog(Base):
     __tablename__ = 'audit_log'
-    
+    __table_args__ = (
+        # Newest-first audit listing
+        Index('ix_audit_log_timestamp', 'timestamp', 'log_id'),
+        # Spool replays skip events that already reached the table
+        Index('ix_audit_log_event_id', 'event_id', unique=True),
+    )
+
     log_id = Column(Integer, primary_key=True)
     timestamp = Column(DateTime, nullable=False, default=func.now())
     user_id = Column(Integer, ForeignKey('base_user.user_id', ondelete='SET NULL'))
@@ -16,4 +22,5 @@ class AuditLog(Base):
     resource = Column(String(100))
     status = Column(Enum(AuditStatusEnum), nullable=False, default=AuditStatusEnum.success)
     details = Column(Text)
+    event_id = Column(String(32))  # set by the write-behind sink
    
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from .base import Base
+
+class ImageBlob(Base):
+    __tablename__ = 'image_blob'
+    __table_args__ = (
+        # The unique index can't serve the compactor's "segment:<file>:%" LIKE under a non-C collation
+        Index('ix_image_blob_image_path_pattern', 'image_path', postgresql_ops={'image_path': 'varchar_pattern_ops'}),
+    )
+
+    # sha256 of "{user_id}:{image_hash}", so dedup never crosses users
+    blob_key = Column(String(64), primary_key=True)
+    user_id = Column(Integer, ForeignKey('base_user.user_id', ondelete='CASCADE'), nullable=False)
+    image_path = Column(String(255), nullable=False, unique=True)
+    file_size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=func.now())
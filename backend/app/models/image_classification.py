@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Numeric, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Numeric, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .enums import ClassificationStatusEnum
@@ -7,6 +7,17 @@ from .base import Base
 
 class ImageClassification(Base):
     __tablename__ = 'image_classification'
+    # Kept in step with the alembic revisions, one index per hot query
+    __table_args__ = (
+        # Result cache lookups by content hash, newest row first
+        Index('ix_image_classification_hash_model', 'image_hash', 'model_used', 'model_version', 'classification_id'),
+        # A user's history and its version token
+        Index('ix_image_classification_user_timestamp', 'user_id', 'classification_timestamp', 'classification_id'),
+        # Admin history across all users
+        Index('ix_image_classification_timestamp', 'classification_timestamp', 'classification_id'),
+        # Segment compaction repoints every row of a moved blob
+        Index('ix_image_classification_image_path', 'image_path'),
+    )
 
     classification_id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('base_user.user_id', ondelete='CASCADE'), nullable=False)
@@ -16,6 +27,7 @@ class ImageClassification(Base):
     file_size = Column(Integer, nullable=False)
     classification_timestamp = Column(DateTime, nullable=False, default=func.now())
     model_used = Column(String(100), nullable=False)
+    model_version = Column(String(12))  # hash of the weights file; NULL for rows from before it was recorded
     top_prediction = Column(String(100))
     confidence_score = Column(Numeric(5, 2))
     process_time_ms = Column(Integer)
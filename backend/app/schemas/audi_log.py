@@ -19,4 +19,7 @@ class AuditLog(BaseModel):
 
 class AuditLogResponseList(BaseModel):
     content: List[AuditLog]
-    total_count: int
+    total_count: Optional[int] = None
+    total_is_estimate: bool = False
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
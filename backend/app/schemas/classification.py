@@ -18,6 +18,21 @@ class ClassificationResponse(BaseModel):
     process_time_ms: int
     classification_timestamp: datetime
 
+class BatchClassificationItem(BaseModel):
+    filename: Optional[str] = None
+    classification_id: Optional[int] = None
+    top_prediction: Optional[str] = None
+    confidence_score: Optional[float] = None
+    status: str
+    error: Optional[str] = None
+
+class BatchClassificationResponse(BaseModel):
+    results: List[BatchClassificationItem]
+    total: int
+    succeeded: int
+    failed: int
+    process_time_ms: int
+
 class ClassificationHistory(BaseModel):
     classification_id: int
     image_hash: str
@@ -50,7 +65,12 @@ class ClassificationHistoryAdminResponseContent(BaseModel):
 
 class ClassificationHistoryAdminResponse(BaseModel):
     content: List[ClassificationHistoryAdminResponseContent]
-    total_count: int
+    # None when total=none was requested
+    total_count: Optional[int] = None
+    total_is_estimate: bool = False
+    # Opaque keyset cursors for the older and newer neighbouring pages
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 
 
@@ -1,4 +1,6 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import commit_or_flush
 from app.models.base_user import BaseUser
 from app.schemas.admin_management import *
 from app.utils.security import *
@@ -8,15 +10,15 @@ from ..models.enums import UserTypeEnum
 class AdminManagementService:
 
     @staticmethod
-    def create_admin(db: Session, admin: AdminCreate) -> AdminCreateResponse:
-        user = db.query(BaseUser).filter(BaseUser.username == admin.username).first()
+    async def create_admin(db: AsyncSession, admin: AdminCreate) -> AdminCreateResponse:
+        user = await db.scalar(select(BaseUser).where(BaseUser.username == admin.username))
         if user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="User already exists with this username"
             )
         
-        user = db.query(BaseUser).filter(BaseUser.email == admin.email).first()
+        user = await db.scalar(select(BaseUser).where(BaseUser.email == admin.email))
         if user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -34,23 +36,22 @@ class AdminManagementService:
             )
 
             db.add(admin)
-            db.commit()
-            db.refresh(admin)
+            await commit_or_flush(db)
 
             return AdminCreateResponse(
                 success=True,
                 message="Admin created successfully"
             )
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error creating admin: {str(e)}"
             )
 
     @staticmethod
-    def get_admin_list(db: Session) -> List[AdminListResponse]:
-        admins = db.query(BaseUser).filter(BaseUser.user_type == UserTypeEnum.admin).all()
+    async def get_admin_list(db: AsyncSession) -> List[AdminListResponse]:
+        admins = (await db.scalars(select(BaseUser).where(BaseUser.user_type == UserTypeEnum.admin))).all()
         return [
             AdminListResponse(
                 user_id=admin.user_id,
@@ -65,8 +66,8 @@ class AdminManagementService:
         ]
     
     @staticmethod
-    def update_admin(db: Session, admin_id: int, admin: AdminUpdate) -> AdminUpdateResponse:
-        admin_data = db.query(BaseUser).filter(BaseUser.user_id == admin_id).first()
+    async def update_admin(db: AsyncSession, admin_id: int, admin: AdminUpdate) -> AdminUpdateResponse:
+        admin_data = await db.get(BaseUser, admin_id)
         if not admin_data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -87,14 +88,13 @@ class AdminManagementService:
             admin_data.locked_until = None
 
         try:
-            db.commit()
-            db.refresh(admin_data)
+            await commit_or_flush(db)
             return AdminUpdateResponse(
                 success=True,
                 message="Admin updated successfully"
             )
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error updating admin: {str(e)}"
@@ -1,16 +1,20 @@
 
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, select
 from sqlalchemy.sql import func
+from ..db.session import commit_or_flush
 from ..models.audit_log import AuditLog
 from ..models.base_user import BaseUser
 from ..schemas.audi_log import AuditLogResponseList, AuditLog as AuditLogSchema, AuditLogUserInfo
 from ..models.enums import ActionTypeEnum, AuditStatusEnum
+from ..utils.pagination import Cursor, TotalMode, page_cursors, paginate
+from .audit_sink import audit_sink
+from .row_counts import count_rows
 
-def add_audit_log(
-    db: Session,
+async def add_audit_log(
+    db: AsyncSession,
     action: ActionTypeEnum,
     user_id: Optional[int] = None,
     ip_address: Optional[str] = None,
@@ -18,7 +22,20 @@ def add_audit_log(
     resource: Optional[str] = None,
     status: AuditStatusEnum = AuditStatusEnum.success,
     details: Optional[str] = None
-) -> AuditLog:
+) -> None:
+
+    if audit_sink.running:
+        # Write-behind: batched into the table off the request path
+        await audit_sink.log(
+            user_id=user_id,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            action=action,
+            resource=resource,
+            status=status,
+            details=details
+        )
+        return
 
     audit_log = AuditLog(
         user_id=user_id,
@@ -31,21 +48,26 @@ def add_audit_log(
     )
     
     db.add(audit_log)
-    db.commit()
-    db.refresh(audit_log)
-    
-    return audit_log
+    await commit_or_flush(db)
 
-def get_audit_logs(db: Session, limit: int, offset: int) -> AuditLogResponseList:
+async def get_audit_log_version(db: AsyncSession) -> int:
+    """Audit logs are append-only, so the newest id versions the whole listing"""
+    # Events this worker accepted but hasn't inserted yet count as already there: inserting them
+    # raises the newest id by as much as it lowers pending, so polling doesn't flush the sink
+    return (await db.scalar(select(func.max(AuditLog.log_id))) or 0) + audit_sink.pending
 
-    total_count = db.query(AuditLog).count()
-    
-    audit_logs = db.query(AuditLog, BaseUser)\
-        .outerjoin(BaseUser, AuditLog.user_id == BaseUser.user_id)\
-        .order_by(AuditLog.timestamp.desc())\
-        .offset(offset)\
-        .limit(limit)\
-        .all()
+async def get_audit_logs(db: AsyncSession, limit: int, offset: int = 0, cursor: Optional[Cursor] = None,
+                         total: TotalMode = TotalMode.cached) -> AuditLogResponseList:
+
+    total_count, total_is_estimate = await count_rows(db, AuditLog, total)
+
+    rows = (await db.execute(paginate(
+        select(AuditLog, BaseUser).outerjoin(BaseUser, AuditLog.user_id == BaseUser.user_id),
+        AuditLog.timestamp, AuditLog.log_id, limit, offset, cursor
+    ))).all()
+    audit_logs, next_cursor, prev_cursor = page_cursors(
+        rows, [(row.AuditLog.timestamp, row.AuditLog.log_id) for row in rows], limit, offset, cursor
+    )
     
     content = [
         AuditLogSchema(
@@ -66,7 +88,10 @@ def get_audit_logs(db: Session, limit: int, offset: int) -> AuditLogResponseList
     
     return AuditLogResponseList(
         content=content,
-        total_count=total_count
+        total_count=total_count,
+        total_is_estimate=total_is_estimate,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor
     )
 
     
\ No newline at end of file
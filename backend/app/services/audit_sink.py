@@ -0,0 +1,327 @@
+"""
+This file contains the write-behind audit sink: a local spool in front of batched inserts
+"""
+import asyncio
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, List, Optional
+
+from sqlalchemy import exc
+from sqlalchemy.dialects import postgresql, sqlite
+
+from ..core.config import settings
+from ..db.session import AsyncSessionLocal
+from ..models.audit_log import AuditLog
+from .storage_io import OperationStats, storage_io
+
+AUDIT_SPOOL_DIR = Path(__file__).resolve().parent.parent.parent.parent / 'storage' / 'audit_spool'
+
+# The database is slow or unreachable: keep the batch in the spool and retry it later
+RETRYABLE_ERRORS = (asyncio.TimeoutError, exc.OperationalError, exc.InterfaceError, OSError)
+FOREIGN_KEY_VIOLATION = "23503"
+SEGMENT_OPEN_ATTEMPTS = 3
+
+def _is_foreign_key_violation(error: exc.DBAPIError) -> bool:
+    if not isinstance(error, exc.IntegrityError):
+        return False
+    # psycopg2 and asyncpg report the SQLSTATE; SQLite only has the message
+    code = getattr(error.orig, "pgcode", None)
+    if code is not None:
+        return code == FOREIGN_KEY_VIOLATION
+    return "FOREIGN KEY" in str(error.orig).upper()
+
+def _insert_statement(dialect_name: str):
+    # Replayed events that already reached the table are skipped, not duplicated
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    return insert(AuditLog).on_conflict_do_nothing(index_elements=["event_id"])
+
+def _row(event: dict) -> dict:
+    return {**event, "timestamp": datetime.fromisoformat(event["timestamp"])}
+
+def _read_spool(path: Path) -> List[dict]:
+    events = []
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                # Only the last line can be torn, by a crash in the middle of an append
+                print(f"Skipping torn audit spool record in {path.name}")
+    return events
+
+class SpoolSegment:
+    """One spool file, locked for as long as this worker owns it"""
+
+    def __init__(self, path: Path, fd: int, events: Optional[List[dict]] = None):
+        self.path = path
+        self.fd = fd
+        # None once spilled: the events then live only in the file
+        self.events = events
+        # Appended by this worker; replayed orphans count as 0
+        self.appended = 0
+
+    def load(self) -> List[dict]:
+        return self.events if self.events is not None else _read_spool(self.path)
+
+    def release(self, delete: bool) -> None:
+        if delete:
+            self.path.unlink(missing_ok=True)
+        os.close(self.fd)
+
+class AuditSink:
+    """Journals every audit event to an append-only spool, then bulk-inserts them in order"""
+
+    def __init__(self, spool_dir: Path = AUDIT_SPOOL_DIR,
+                 batch_size: int = settings.AUDIT_BATCH_SIZE,
+                 flush_interval_ms: float = settings.AUDIT_FLUSH_INTERVAL_MS,
+                 flush_timeout_seconds: float = settings.AUDIT_FLUSH_TIMEOUT_SECONDS,
+                 fsync: bool = settings.AUDIT_SPOOL_FSYNC):
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self.flush_timeout_seconds = flush_timeout_seconds
+        self.fsync = fsync
+
+        self._append_lock = threading.Lock()
+        self._active: Optional[SpoolSegment] = None
+        self._sequence = 0
+        # Sealed segments, flushed strictly oldest first so each user's events keep their order
+        self._sealed: Deque[SpoolSegment] = deque()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.pending = 0
+        self.inserted = 0
+        self.spilled = 0
+        self.rejected = 0
+        self.poisoned = 0
+        self.flush_stats = OperationStats()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def _open_segment(self, path: Path, flags: int) -> Optional[int]:
+        fd = os.open(path, flags, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # Still owned by a live worker
+            os.close(fd)
+            return None
+        return fd
+
+    def _claim_orphans(self) -> None:
+        """Queue spool files left by workers that stopped before flushing them (blocking)"""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        for path in sorted(self.spool_dir.glob('*.jsonl')):
+            fd = self._open_segment(path, os.O_RDONLY)
+            if fd is not None:
+                self._sealed.append(SpoolSegment(path, fd))
+                print(f"Replaying audit spool {path.name}")
+
+    def _append(self, event: dict) -> int:
+        """Journal one event and buffer it; returns the number buffered (blocking)"""
+        line = json.dumps(event, separators=(",", ":")).encode() + b"\n"
+        with self._append_lock:
+            if self._active is None:
+                self._active = self._new_segment()
+
+            os.write(self._active.fd, line)
+            if self.fsync:
+                # The request has been answered once log() returns, so the event must survive a crash
+                os.fsync(self._active.fd)
+            else:
+                storage_io.commit_write(self._active.path, self._active.fd)
+            self._active.events.append(event)
+            self._active.appended += 1
+            self.pending += 1
+            return len(self._active.events)
+
+    def _new_segment(self) -> SpoolSegment:
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        for _ in range(SEGMENT_OPEN_ATTEMPTS):
+            self._sequence += 1
+            path = self.spool_dir / f"{time.time_ns()}-{os.getpid()}-{self._sequence}.jsonl"
+            fd = self._open_segment(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND)
+            if fd is not None:
+                if self.fsync:
+                    storage_io.sync([path])
+                return SpoolSegment(path, fd, [])
+            # Another worker's orphan claim locked it between create and flock; it replays the empty file
+        raise OSError(f"Could not lock a new audit spool segment in {self.spool_dir}")
+
+    def _seal(self) -> None:
+        with self._append_lock:
+            if self._active is not None:
+                self._sealed.append(self._active)
+                self._active = None
+
+    def _settle(self, segment: SpoolSegment) -> None:
+        """Stop counting a segment's events as pending once it has left the queue"""
+        with self._append_lock:
+            self.pending -= segment.appended
+
+    async def log(self, **fields) -> None:
+        """Accept an audit event; it reaches the database with the next batch"""
+        event = {
+            **{name: getattr(value, "value", value) for name, value in fields.items()},
+            "event_id": uuid.uuid4().hex,
+            "timestamp": datetime.now().isoformat(),
+        }
+        buffered = await storage_io.run("audit_spool", self._append, event)
+        if buffered >= self.batch_size and self._wake is not None:
+            self._wake.set()
+
+    async def _insert(self, rows: List[dict]) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(_insert_statement(db.bind.dialect.name), rows)
+            await db.commit()
+
+    async def _insert_each(self, segment: SpoolSegment, events: List[dict]) -> None:
+        """Fallback when a batch is rejected as a whole: insert event by event, quarantining the ones the DB refuses"""
+        rejected = []
+        for event in events:
+            try:
+                await asyncio.wait_for(self._insert([_row(event)]), self.flush_timeout_seconds)
+                continue
+            except RETRYABLE_ERRORS:
+                raise
+            except exc.DBAPIError as e:
+                error = e
+
+            if _is_foreign_key_violation(error):
+                try:
+                    # The user was deleted before the event got in; ON DELETE SET NULL would have done the same
+                    await asyncio.wait_for(self._insert([{**_row(event), "user_id": None}]), self.flush_timeout_seconds)
+                    continue
+                except RETRYABLE_ERRORS:
+                    raise
+                except exc.DBAPIError as e:
+                    error = e
+
+            print(f"Rejected audit event {event['event_id']}: {str(error)}")
+            rejected.append(event)
+
+        if rejected:
+            # Kept next to the spool for inspection, never retried automatically
+            lines = b"".join(json.dumps(event).encode() + b"\n" for event in rejected)
+            await storage_io.run("audit_spool", storage_io.write_atomic, segment.path.with_suffix(".rejected"), [lines])
+            self.rejected += len(rejected)
+
+    @staticmethod
+    def _set_aside(segment: SpoolSegment) -> None:
+        """Move a segment that can never be inserted out of the queue, keeping the file (blocking)"""
+        try:
+            os.replace(segment.path, segment.path.with_suffix(".poison"))
+        finally:
+            segment.release(delete=False)
+
+    async def flush(self) -> bool:
+        """Insert everything accepted so far; False if the database was too slow and events stay spooled"""
+        if self._flush_lock is None:
+            return True
+
+        async with self._flush_lock:
+            self._seal()
+            while self._sealed:
+                segment = self._sealed[0]
+                start = time.perf_counter()
+                try:
+                    events = await storage_io.run("audit_spool", segment.load)
+                    try:
+                        await asyncio.wait_for(self._insert([_row(event) for event in events]), self.flush_timeout_seconds)
+                    except RETRYABLE_ERRORS:
+                        raise
+                    except exc.DBAPIError:
+                        await self._insert_each(segment, events)
+                except RETRYABLE_ERRORS as e:
+                    self.flush_stats.record((time.perf_counter() - start) * 1000, True)
+                    if segment.events is not None:
+                        # Spill: the spool file keeps the batch, so a slow DB can't grow memory
+                        self.spilled += len(segment.events)
+                        segment.events = None
+                    print(f"Audit flush deferred, {len(self._sealed)} spool segment(s) pending: {str(e)}")
+                    return False
+                except Exception as e:
+                    # Fails the same way on every retry (a malformed record, a statement that can't compile),
+                    # so it must not block the segments behind it
+                    self.flush_stats.record((time.perf_counter() - start) * 1000, True)
+                    self._sealed.popleft()
+                    self._settle(segment)
+                    await storage_io.run("audit_spool", self._set_aside, segment)
+                    self.poisoned += 1
+                    print(f"Set aside audit spool {segment.path.name} as .poison: {str(e)}")
+                    continue
+
+                self.flush_stats.record((time.perf_counter() - start) * 1000, False)
+                self._sealed.popleft()
+                self._settle(segment)
+                segment.release(delete=True)
+                self.inserted += len(events)
+            return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error flushing audit events: {str(e)}")
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        await storage_io.run("audit_spool", self._claim_orphans)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Flush what is left; anything the DB still refuses is replayed by the next start"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Error flushing audit events on shutdown: {str(e)}")
+        self._seal()
+        while self._sealed:
+            self._sealed.popleft().release(delete=False)
+
+    def stats(self) -> dict:
+        with self._append_lock:
+            buffered = len(self._active.events) if self._active is not None else 0
+        return {
+            "write_behind": self.running,
+            "buffered": buffered,
+            "pending": self.pending,
+            "pending_segments": len(self._sealed),
+            "inserted": self.inserted,
+            "spilled": self.spilled,
+            "rejected": self.rejected,
+            "poisoned_segments": self.poisoned,
+            "flush": self.flush_stats.snapshot(),
+        }
+
+
+audit_sink = AuditSink()
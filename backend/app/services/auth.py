@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 
+from ..db.session import commit_or_flush
 from ..models.base_user import BaseUser 
 from ..utils.security import verify_password, get_password_hash, is_strong_password
 from ..schemas.auth import UserSignup
@@ -9,15 +11,15 @@ from ..models.enums import UserTypeEnum
 
 class AuthService:
     @staticmethod
-    def create_user(db: Session, user_data: UserSignup) -> BaseUser:
-        existing_user = db.query(BaseUser).filter(BaseUser.username == user_data.username).first()
+    async def create_user(db: AsyncSession, user_data: UserSignup) -> BaseUser:
+        existing_user = await db.scalar(select(BaseUser).where(BaseUser.username == user_data.username))
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username already exists"
             )
         
-        existing_email = db.query(BaseUser).filter(BaseUser.email == user_data.email).first()
+        existing_email = await db.scalar(select(BaseUser).where(BaseUser.email == user_data.email))
         if existing_email:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -41,14 +43,13 @@ class AuthService:
         )
         
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await commit_or_flush(db)
         
         return new_user
 
     @staticmethod
-    def authenticate_user(db: Session, username: str, password: str):
-        base_user = db.query(BaseUser).filter(BaseUser.username == username).first()
+    async def authenticate_user(db: AsyncSession, username: str, password: str):
+        base_user = await db.scalar(select(BaseUser).where(BaseUser.username == username))
         if not base_user:
             return None
         
@@ -64,11 +65,11 @@ class AuthService:
             if base_user.login_attempts >= 5:
                 base_user.locked_until = datetime.now() + timedelta(minutes=30)
 
-            db.commit()
+            await commit_or_flush(db)
             return None
         
         base_user.login_attempts = 0
         base_user.last_activity = datetime.now()
-        db.commit()
+        await commit_or_flush(db)
 
         return base_user
\ No newline at end of file
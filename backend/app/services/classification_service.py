@@ -1,94 +1,311 @@
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 import hashlib
 import time
-from typing import List
-from sqlalchemy.orm import Session
+from typing import AsyncIterator, Callable, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
 from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
 
+from ..db.session import commit_or_flush
 from ..models.image_classification import ImageClassification
 from ..models.enums import ClassificationStatusEnum
-from ..schemas.classification import ClassificationResponse, ClassificationHistory, ClassificationHistoryAdminResponse, ClassificationHistoryAdminResponseContent
-from ..utils.model import classify_image
+from ..schemas.classification import ClassificationResponse, ClassificationHistory, ClassificationHistoryAdminResponse, ClassificationHistoryAdminResponseContent, BatchClassificationItem, BatchClassificationResponse
+from ..utils.archive import ArchiveItem, iter_archive_images
+from ..utils.pagination import TotalMode, decode_cursor, page_cursors, paginate
+from ..utils.upload import IngestedUpload, ingest_upload
+from ..utils.preprocessing import image_preprocessor, UnsupportedImageError, ImageTooLargeError
+from ..utils.thumbnail import render_thumbnail
+from ..core.config import settings
 from .image_storage_service import ImageStorageService
+from .inference_scheduler import inference_scheduler, forward_batch
+from .inference_executor import inference_executor
+from .model_registry import model_registry
+from .result_cache import result_cache
+from .row_counts import count_rows
+from .thumbnail_service import schedule_thumbnail, schedule_thumbnail_write
 from ..models.base_user import BaseUser
 
+CONFIDENCE_THRESHOLD = Decimal("0.60")
+# Scale of the Numeric(5, 2) confidence_score column
+CONFIDENCE_QUANTUM = Decimal("0.01")
+
+def stored_confidence(probability: float) -> Decimal:
+    """Round a probability the way the column stores it, so status agrees with the score read back later"""
+    return Decimal(str(probability)).quantize(CONFIDENCE_QUANTUM, rounding=ROUND_HALF_UP)
+
+def confidence_status(confidence_score: Decimal) -> ClassificationStatusEnum:
+    if confidence_score >= CONFIDENCE_THRESHOLD:
+        return ClassificationStatusEnum.success
+    return ClassificationStatusEnum.failed
+
+async def iter_file_uploads(files: List[UploadFile]) -> AsyncIterator[ArchiveItem]:
+    for file in files:
+        if file.size is not None and file.size > settings.MAX_UPLOAD_BYTES:
+            yield file.filename, None, f"File exceeds the {settings.MAX_UPLOAD_BYTES} byte limit"
+            continue
+        yield file.filename, await file.read(), None
+
+async def iter_archive_upload(archive: UploadFile) -> AsyncIterator[ArchiveItem]:
+    # Members are decompressed one at a time in the threadpool, off the event loop
+    members = iter_archive_images(archive.file, settings.MAX_UPLOAD_BYTES)
+    while True:
+        item = await run_in_threadpool(next, members, None)
+        if item is None:
+            break
+        yield item
+
 class ClassificationService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.image_storage = ImageStorageService(db)
 
     async def process_image(self, file: UploadFile, user_id: int) -> ClassificationResponse:
         start_time = time.time()
+        with await ingest_upload(file) as upload:
+            return await self.process_upload(upload, file.filename, user_id, start_time)
+
+    async def process_upload(self, upload: IngestedUpload, filename: Optional[str], user_id: int,
+                             start_time: Optional[float] = None) -> ClassificationResponse:
+        start_time = start_time or time.time()
         
         try:
-            image_bytes = await file.read()
-            print(f"Read image bytes: {len(image_bytes)} bytes")  # Debug log
+            print(f"Ingested upload: {upload.size} bytes")  # Debug log
+            
+            # Reject unsupported or oversized images from the header, before any decode
+            try:
+                image_preprocessor.probe(upload.open())
+            except UnsupportedImageError as e:
+                raise HTTPException(status_code=415, detail=str(e))
+            except ImageTooLargeError as e:
+                raise HTTPException(status_code=413, detail=str(e))
             
-            image_hash = hashlib.sha256(image_bytes).hexdigest()
+            # Hashed while streaming; the body itself stays in the spool and is read from it chunk by chunk
+            image_hash = upload.sha256
             print(f"Generated image hash: {image_hash}")  # Debug log
+            model_version = model_registry.version(settings.DEFAULT_MODEL)
+            
+            # Classified before anything is flushed or stored, so no connection or blob row lock
+            # is held during inference
+            try:
+                # Re-uploads of the same bytes reuse the earlier result, but still get their own record
+                top_prediction = await result_cache.get_or_compute(
+                    image_hash, settings.DEFAULT_MODEL, model_version,
+                    lambda: self._predict(upload)
+                )
+                print(f"Got top prediction: {top_prediction}")  # Debug log
+                
+                # Rendered before the spool is closed; only the encrypted write runs in the background
+                thumbnail = await self._run_on_upload(render_thumbnail, upload) if settings.THUMBNAIL_ON_UPLOAD else None
+                prediction_error = None
+            except Exception as e:
+                print(f"Error in classification process: {str(e)}")  
+                prediction_error = e
             
             classification = ImageClassification(
                 user_id=user_id,
                 image_hash=image_hash,
-                original_filename=file.filename,
-                file_size=len(image_bytes),
-                model_used="cifar10_resnet20",
+                original_filename=filename,
+                file_size=upload.size,
+                model_used=settings.DEFAULT_MODEL,
+                model_version=model_version,
                 status=ClassificationStatusEnum.failed
             )
             self.db.add(classification)
-            self.db.flush()
+            await self.db.flush()
             print(f"Created classification record with ID: {classification.classification_id}")  # Debug log
             
-            # Store image first, before classification attempt
+            # Stored even when classification failed, like the record itself
             print("Attempting to store image...")  # Debug log
-            image_path = await self.image_storage.store_image(image_bytes, classification.classification_id)
+            image_path = await self.image_storage.write_image(classification, upload.open())
             print(f"Image stored at: {image_path}")  # Debug log
             
-            try:
-                predictions = classify_image(image_bytes)
-                top_prediction = predictions[0]
-                print(f"Got predictions: {predictions}")  # Debug log
-                
-                classification.top_prediction = top_prediction["class"]
-                classification.confidence_score = top_prediction["probability"]
-                
-                if top_prediction["probability"] >= 0.60:
-                    classification.status = ClassificationStatusEnum.success
-                else:
-                    classification.status = ClassificationStatusEnum.failed
-                
-                process_time_ms = int((time.time() - start_time) * 1000)
-                classification.process_time_ms = process_time_ms
-                
-                self.db.commit()
-                self.db.refresh(classification) 
-                return ClassificationResponse(
-                    classification_id=classification.classification_id,
-                    top_prediction=classification.top_prediction,
-                    confidence_score=float(classification.confidence_score),
-                    process_time_ms=process_time_ms,
-                    classification_timestamp=classification.classification_timestamp
-                )
-                
-            except Exception as e:
-                print(f"Error in classification process: {str(e)}")  
+            if prediction_error is not None:
                 classification.status = ClassificationStatusEnum.error
-                self.db.commit()
-                raise HTTPException(status_code=500, detail=str(e))
+                await commit_or_flush(self.db)
+                raise HTTPException(status_code=500, detail=str(prediction_error))
+            
+            classification.top_prediction = top_prediction["class"]
+            # Fresh and cached results pass the threshold on the same rounded score
+            classification.confidence_score = stored_confidence(top_prediction["probability"])
+            classification.status = confidence_status(classification.confidence_score)
+            
+            process_time_ms = int((time.time() - start_time) * 1000)
+            classification.process_time_ms = process_time_ms
+            
+            await commit_or_flush(self.db)
+            if thumbnail is not None:
+                schedule_thumbnail_write(user_id, image_hash, thumbnail)
+            return ClassificationResponse(
+                classification_id=classification.classification_id,
+                top_prediction=classification.top_prediction,
+                confidence_score=float(classification.confidence_score),
+                process_time_ms=process_time_ms,
+                classification_timestamp=classification.classification_timestamp
+            )
                 
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"Error in process_image: {str(e)}")  
             raise HTTPException(status_code=500, detail=str(e))
 
-    def get_classification_history(self, user_id: int, limit: int = 10) -> List[ClassificationHistory]:
+    @staticmethod
+    async def _run_on_upload(fn: Callable, upload: IngestedUpload):
+        """Run fn over the upload in the inference pool, decoding straight from the spool file"""
+        if inference_executor.kind == "process":
+            # Arguments are pickled into the worker process, which cannot share the spool file
+            return await inference_executor.run(fn, await run_in_threadpool(upload.read_bytes))
+        return await inference_executor.run(fn, upload.open())
+
+    async def _predict(self, upload: IngestedUpload) -> dict:
+        image_tensor = await self._run_on_upload(image_preprocessor.preprocess, upload)
+        predictions = await inference_scheduler.submit(settings.DEFAULT_MODEL, image_tensor)
+        return predictions[0]
+
+    async def process_batch(self, items: AsyncIterator[ArchiveItem], user_id: int) -> BatchClassificationResponse:
+        """Classify many images in inference-sized chunks, one bulk insert and commit per chunk"""
+        start_time = time.time()
+        results: List[BatchClassificationItem] = []
+        chunk: List[ArchiveItem] = []
+        seen = 0
+
+        async for item in items:
+            if seen >= settings.BATCH_MAX_IMAGES:
+                results.append(BatchClassificationItem(
+                    filename=item[0],
+                    status="rejected",
+                    error=f"Batch limit of {settings.BATCH_MAX_IMAGES} images reached, remaining files were skipped"
+                ))
+                break
+
+            seen += 1
+            chunk.append(item)
+            if len(chunk) >= settings.INFERENCE_MAX_BATCH_SIZE:
+                results.extend(await self._classify_chunk(chunk, user_id))
+                chunk = []
+
+        if chunk:
+            results.extend(await self._classify_chunk(chunk, user_id))
+
+        succeeded = sum(1 for result in results if result.classification_id is not None)
+        return BatchClassificationResponse(
+            results=results,
+            total=len(results),
+            succeeded=succeeded,
+            failed=len(results) - succeeded,
+            process_time_ms=int((time.time() - start_time) * 1000)
+        )
+
+    async def _classify_chunk(self, chunk: List[ArchiveItem], user_id: int) -> List[BatchClassificationItem]:
+        chunk_start = time.time()
+        results: List[Optional[BatchClassificationItem]] = [None] * len(chunk)
+
+        accepted = []
+        for i, (filename, image_bytes, error) in enumerate(chunk):
+            if error is None:
+                try:
+                    image_preprocessor.probe(image_bytes)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                results[i] = BatchClassificationItem(filename=filename, status="rejected", error=error)
+                continue
+            accepted.append((i, filename, image_bytes))
+
+        if accepted:
+            # Images classified before, by this batch or any upload, skip decode and the forward pass
+            hashes = [hashlib.sha256(image_bytes).hexdigest() for _, _, image_bytes in accepted]
+            model_version = model_registry.version(settings.DEFAULT_MODEL)
+            known = await result_cache.get_many(self.db, hashes, settings.DEFAULT_MODEL, model_version)
+            pending = [(item, image_hash) for item, image_hash in zip(accepted, hashes) if image_hash not in known]
+
+            if pending:
+                batch, errors = await inference_executor.run(
+                    image_preprocessor.preprocess_valid, [image_bytes for (_, _, image_bytes), _ in pending]
+                )
+                valid = [image_hash for (_, image_hash), error in zip(pending, errors) if error is None]
+                for ((i, filename, _), _), error in zip(pending, errors):
+                    if error is not None:
+                        results[i] = BatchClassificationItem(filename=filename, status="rejected", error=error)
+
+                if valid:
+                    predictions = await inference_executor.run(forward_batch, settings.DEFAULT_MODEL, batch)
+                    for image_hash, prediction in zip(valid, predictions):
+                        known[image_hash] = prediction[0]
+                        result_cache.put(image_hash, settings.DEFAULT_MODEL, model_version, prediction[0])
+
+            decoded = [(item, image_hash) for item, image_hash in zip(accepted, hashes) if image_hash in known]
+            if decoded:
+                process_time_ms = int((time.time() - chunk_start) * 1000)
+
+                classifications = []
+                for (_, filename, image_bytes), image_hash in decoded:
+                    confidence_score = stored_confidence(known[image_hash]["probability"])
+                    classifications.append(ImageClassification(
+                        user_id=user_id,
+                        image_hash=image_hash,
+                        original_filename=filename,
+                        file_size=len(image_bytes),
+                        model_used=settings.DEFAULT_MODEL,
+                        model_version=model_version,
+                        top_prediction=known[image_hash]["class"],
+                        confidence_score=confidence_score,
+                        process_time_ms=process_time_ms,
+                        status=confidence_status(confidence_score)
+                    ))
+
+                try:
+                    # A savepoint, so a failed chunk only expires its own rows, not the request's user
+                    async with self.db.begin_nested():
+                        self.db.add_all(classifications)
+                        await self.db.flush()
+                        for classification, ((_, _, image_bytes), _) in zip(classifications, decoded):
+                            await self.image_storage.write_image(classification, image_bytes)
+                    await self.db.commit()
+                except Exception as e:
+                    print(f"Error storing batch chunk: {str(e)}")
+                    for (i, filename, _), _ in decoded:
+                        results[i] = BatchClassificationItem(filename=filename, status="error", error=str(e))
+                else:
+                    for classification, ((i, filename, image_bytes), _) in zip(classifications, decoded):
+                        if settings.THUMBNAIL_ON_UPLOAD:
+                            schedule_thumbnail(user_id, classification.image_hash, image_bytes)
+                        results[i] = BatchClassificationItem(
+                            filename=filename,
+                            classification_id=classification.classification_id,
+                            top_prediction=classification.top_prediction,
+                            confidence_score=float(classification.confidence_score),
+                            status=classification.status.value
+                        )
+
+        return results
+
+    async def get_history_version(self, user_id: Optional[int] = None) -> str:
+        """Token that changes whenever rows are added to or removed from a history listing.
+
+        Exact count plus max id: ids only grow, so a delete followed by an insert still changes it. The joined
+        user columns (username, email, user_type) are fixed at signup, and deleting a user cascades to their
+        rows, so the classification table alone versions the admin listing.
+        """
+        query = select(func.count(ImageClassification.classification_id), func.max(ImageClassification.classification_id))
+        if user_id is not None:
+            query = query.where(ImageClassification.user_id == user_id)
+        count, max_id = (await self.db.execute(query)).one()
+        return f"{count}-{max_id or 0}"
+
+    async def get_classification_history(self, user_id: int, limit: int = 10) -> List[ClassificationHistory]:
 
         try:
             print(f"Fetching history for user {user_id}")  
-            classifications = self.db.query(ImageClassification)\
-                .filter(ImageClassification.user_id == user_id)\
-                .order_by(ImageClassification.classification_timestamp.desc())\
-                .limit(limit)\
-                .all()
+            classifications = (await self.db.scalars(
+                select(ImageClassification)
+                .where(ImageClassification.user_id == user_id)
+                .order_by(ImageClassification.classification_timestamp.desc())
+                .limit(limit)
+            )).all()
             
             print(f"Found {len(classifications)} classifications")  
                 
@@ -108,7 +325,8 @@ class ClassificationService:
             print(f"Error in get_classification_history: {str(e)}")  
             raise HTTPException(status_code=500, detail=f"Failed to fetch history: {str(e)}") 
 
-    def get_all_classification_history(self, limit: int = 10, offset: int = 0) -> ClassificationHistoryAdminResponse:
+    async def get_all_classification_history(self, limit: int = 10, offset: int = 0, cursor: Optional[str] = None,
+                                             total: TotalMode = TotalMode.cached) -> ClassificationHistoryAdminResponse:
         try:
             if not 1 <= limit <= 100:
                 raise HTTPException(
@@ -122,19 +340,32 @@ class ClassificationService:
                     detail="Offset must be non-negative"
                 )
 
-            total_count = self.db.query(ImageClassification).count()
-            
-            classifications = self.db.query(
-                ImageClassification,
-                BaseUser.username,
-                BaseUser.email,
-                BaseUser.user_type
-            )\
-                .join(BaseUser, ImageClassification.user_id == BaseUser.user_id)\
-                .order_by(ImageClassification.classification_timestamp.desc())\
-                .offset(offset)\
-                .limit(limit)\
-                .all()
+            if cursor is not None and offset:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Use either cursor or offset, not both"
+                )
+            position = decode_cursor(cursor) if cursor is not None else None
+
+            total_count, total_is_estimate = await count_rows(self.db, ImageClassification, total)
+
+            rows = (await self.db.execute(paginate(
+                select(
+                    ImageClassification,
+                    BaseUser.username,
+                    BaseUser.email,
+                    BaseUser.user_type
+                )
+                .join(BaseUser, ImageClassification.user_id == BaseUser.user_id),
+                ImageClassification.classification_timestamp,
+                ImageClassification.classification_id,
+                limit, offset, position
+            ))).all()
+            classifications, next_cursor, prev_cursor = page_cursors(
+                rows,
+                [(row[0].classification_timestamp, row[0].classification_id) for row in rows],
+                limit, offset, position
+            )
             
             content = [
                 ClassificationHistoryAdminResponseContent(
@@ -154,7 +385,10 @@ class ClassificationService:
             
             return ClassificationHistoryAdminResponse(
                 content=content,
-                total_count=total_count
+                total_count=total_count,
+                total_is_estimate=total_is_estimate,
+                next_cursor=next_cursor,
+                prev_cursor=prev_cursor
             )
             
         except HTTPException:
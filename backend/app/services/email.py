@@ -4,9 +4,10 @@ This file contains email verification functions
 import random
 import string
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 
+from ..db.session import commit_or_flush
 from ..models.base_user import BaseUser
 from ..core.config import settings
 from .sendgrid_service import sendgrid_service
@@ -42,9 +43,9 @@ class EmailService:
             print(f"Verification code {code} sent to {email}")
 
     @staticmethod
-    def initiate_verification(db: Session, user_id: int) -> str:
+    async def initiate_verification(db: AsyncSession, user_id: int) -> str:
         """Initiate email verification process"""
-        user = db.query(BaseUser).filter(BaseUser.user_id == user_id).first()
+        user = await db.get(BaseUser, user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -55,15 +56,15 @@ class EmailService:
         
         user.email_verification_code = verification_code
         user.email_verification_expires_at = datetime.now() + timedelta(minutes=1)
-        db.commit()
+        await commit_or_flush(db)
 
         EmailService.send_verification_email(user.email, verification_code)
 
         return verification_code
 
     @staticmethod
-    def verify_email(db: Session, user_id: int, code: str) -> bool:
-        user = db.query(BaseUser).filter(BaseUser.user_id == user_id).first()
+    async def verify_email(db: AsyncSession, user_id: int, code: str) -> bool:
+        user = await db.get(BaseUser, user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -78,6 +79,6 @@ class EmailService:
         user.is_email_verified = True
         user.email_verification_code = None
         user.email_verification_expires_at = None
-        db.commit()
+        await commit_or_flush(db)
 
         return True 
\ No newline at end of file
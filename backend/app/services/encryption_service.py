@@ -1,48 +1,225 @@
+from abc import ABC, abstractmethod
+import io
 import os
+import struct
+import threading
+import time
+from collections import OrderedDict
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import base64
-from typing import Tuple
-from sqlalchemy.orm import Session
+from typing import BinaryIO, Iterator, Tuple
+from ..core.config import settings
 from ..models.base_user import BaseUser
 
-class EncryptionService:
-    def __init__(self, db: Session):
-        self.db = db
-        self.salt = os.urandom(16)  
+# Envelope files start with MAGIC and a format version byte; legacy files start with a raw salt
+MAGIC = b"ICS"
+ENVELOPE_VERSION = 1  # single AES-GCM message
+CHUNKED_VERSION = 2  # AES-GCM chunks, decryptable independently for range reads
+KEK_ITERATIONS = 100000
+NONCE_SIZE = 12
+NONCE_PREFIX_SIZE = 8  # chunk nonces are prefix + 4 byte chunk index
+TAG_SIZE = 16
+
+class KeyEncryptionKeyCache:
+    """Per-user key-encryption keys, derived once and kept in an LRU for a TTL"""
+
+    def __init__(self, ttl_seconds: int = settings.IMAGE_KEK_CACHE_TTL_SECONDS,
+                 max_entries: int = settings.IMAGE_KEK_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._keys: "OrderedDict[int, Tuple[float, bytes]]" = OrderedDict()
+        # Read from the storage I/O threads as well as the event loop
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> bytes:
+        with self._lock:
+            entry = self._keys.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._keys.move_to_end(user_id)
+                return entry[1]
+
+        key = self._derive(user_id)
+        with self._lock:
+            self._keys[user_id] = (time.monotonic() + self.ttl_seconds, key)
+            self._keys.move_to_end(user_id)
+            while len(self._keys) > self.max_entries:
+                self._keys.popitem(last=False)
+        return key
+
+    @staticmethod
+    def _derive(user_id: int) -> bytes:
+        master_key = settings.IMAGE_MASTER_KEY.encode()
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=f"image-kek:{user_id}".encode(),
+            iterations=KEK_ITERATIONS,
+        )
+        return kdf.derive(master_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys.clear()
+
+
+kek_cache = KeyEncryptionKeyCache()
+
+class StoredImage(ABC):
+    """Decrypted view of a stored image, read whole or as an inclusive byte range"""
+    size: int
+
+    @abstractmethod
+    def iter_range(self, start: int, end: int) -> Iterator[bytes]:
+        ...
+
+    def read(self) -> bytes:
+        return b"".join(self.iter_range(0, self.size - 1))
+
+    def close(self) -> None:
+        pass
+
+class PlainImage(StoredImage):
+    """Image already decrypted in memory (legacy and single-message files)"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.size = len(data)
+
+    def iter_range(self, start: int, end: int) -> Iterator[bytes]:
+        if start <= end:
+            yield self.data[start:end + 1]
+
+class ChunkedImage(StoredImage):
+    """Chunked container that only reads and decrypts the chunks a range touches"""
+
+    def __init__(self, fileobj: BinaryIO, cipher: AESGCM, aad: bytes, nonce_prefix: bytes,
+                 chunk_size: int, size: int):
+        self.fileobj = fileobj
+        self.cipher = cipher
+        self.aad = aad
+        self.nonce_prefix = nonce_prefix
+        self.chunk_size = chunk_size
+        self.size = size
+        self.data_offset = fileobj.tell()
+
+    def _chunk(self, index: int) -> bytes:
+        self.fileobj.seek(self.data_offset + index * (self.chunk_size + TAG_SIZE))
+        plain_length = min(self.chunk_size, self.size - index * self.chunk_size)
+        ciphertext = self.fileobj.read(plain_length + TAG_SIZE)
+        return self.cipher.decrypt(
+            self.nonce_prefix + struct.pack(">I", index),
+            ciphertext,
+            self.aad + struct.pack(">QI", self.size, index)
+        )
 
-    def _derive_key(self, user_id: int, user_specific_salt: bytes) -> bytes:
-        user = self.db.query(BaseUser).filter(BaseUser.user_id == user_id).first()
+    def iter_range(self, start: int, end: int) -> Iterator[bytes]:
+        end = min(end, self.size - 1)
+        for index in range(start // self.chunk_size, end // self.chunk_size + 1):
+            chunk_start = index * self.chunk_size
+            chunk = self._chunk(index)
+            yield chunk[max(start - chunk_start, 0):end - chunk_start + 1]
+
+    def close(self) -> None:
+        self.fileobj.close()
+
+class EncryptionService:
+    def _derive_key(self, user: BaseUser, user_specific_salt: bytes) -> bytes:
         if not user:
             raise ValueError("User not found")
 
         user_data = f"{user.user_id}{user.email}{user.created_at}".encode()
-        
+
         kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
             length=32,
             salt=user_specific_salt,
             iterations=100000,
         )
-        
+
         return base64.urlsafe_b64encode(kdf.derive(user_data))
 
-    def encrypt_image(self, image_bytes: bytes, user_id: int) -> Tuple[bytes, bytes]:
-        user_specific_salt = os.urandom(16)
-        
-        key = self._derive_key(user_id, user_specific_salt)
-        
-        f = Fernet(key)
-        
-        encrypted_data = f.encrypt(image_bytes)
-        
-        return encrypted_data, user_specific_salt
-
-    def decrypt_image(self, encrypted_data: bytes, user_id: int, user_specific_salt: bytes) -> bytes:
-        """Decrypt image data using user-specific key"""
-        key = self._derive_key(user_id, user_specific_salt)
-        
+    @staticmethod
+    def _aad(user_id: int) -> bytes:
+        # Binds wrapped keys and ciphertext to their owner
+        return f"user:{user_id}".encode()
+
+    def _wrap_key(self, data_key: bytes, user_id: int) -> bytes:
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + AESGCM(kek_cache.get(user_id)).encrypt(nonce, data_key, self._aad(user_id))
+
+    def _unwrap_key(self, wrapped_key: bytes, user_id: int) -> bytes:
+        return AESGCM(kek_cache.get(user_id)).decrypt(wrapped_key[:NONCE_SIZE], wrapped_key[NONCE_SIZE:], self._aad(user_id))
+
+    def encrypt_file_chunks(self, fileobj: BinaryIO, size: int, user_id: int,
+                            chunk_size: int = settings.IMAGE_CHUNK_BYTES) -> Iterator[bytes]:
+        """Yield a chunked container: header, then independently authenticated AES-GCM chunks.
+
+        The plaintext is read from fileobj one chunk at a time, so only a chunk is ever in memory.
+        """
+        data_key = AESGCM.generate_key(bit_length=256)
+        wrapped_key = self._wrap_key(data_key, user_id)
+        nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+
+        yield MAGIC + bytes([CHUNKED_VERSION]) + struct.pack(">H", len(wrapped_key)) + wrapped_key \
+            + struct.pack(">IQ", chunk_size, size) + nonce_prefix
+
+        cipher = AESGCM(data_key)
+        aad = self._aad(user_id)
+        for index, offset in enumerate(range(0, size, chunk_size)):
+            chunk = fileobj.read(min(chunk_size, size - offset))
+            if len(chunk) != min(chunk_size, size - offset):
+                raise ValueError("Image ended before its declared size")
+            yield cipher.encrypt(
+                nonce_prefix + struct.pack(">I", index),
+                chunk,
+                aad + struct.pack(">QI", size, index)
+            )
+
+    def encrypt_image_chunks(self, image_bytes: bytes, user_id: int,
+                             chunk_size: int = settings.IMAGE_CHUNK_BYTES) -> Iterator[bytes]:
+        return self.encrypt_file_chunks(io.BytesIO(image_bytes), len(image_bytes), user_id, chunk_size)
+
+    def encrypt_image(self, image_bytes: bytes, user_id: int) -> bytes:
+        """Encrypt under a fresh data key, wrapped by the user's cached key-encryption key"""
+        return b"".join(self.encrypt_image_chunks(image_bytes, user_id))
+
+    def open_image(self, fileobj: BinaryIO, user_id: int) -> StoredImage:
+        """Reader over an envelope file that takes ownership of fileobj; chunked files decrypt lazily"""
+        header = fileobj.read(len(MAGIC) + 3)
+        if len(header) < len(MAGIC) + 3 or not header.startswith(MAGIC):
+            raise ValueError("Stored image is not in envelope format")
+
+        version = header[len(MAGIC)]
+        (wrapped_length,) = struct.unpack_from(">H", header, len(MAGIC) + 1)
+        data_key = self._unwrap_key(fileobj.read(wrapped_length), user_id)
+        aad = self._aad(user_id)
+
+        if version == ENVELOPE_VERSION:
+            nonce = fileobj.read(NONCE_SIZE)
+            image = PlainImage(AESGCM(data_key).decrypt(nonce, fileobj.read(), aad))
+            fileobj.close()
+            return image
+
+        if version == CHUNKED_VERSION:
+            chunk_size, size = struct.unpack(">IQ", fileobj.read(12))
+            nonce_prefix = fileobj.read(NONCE_PREFIX_SIZE)
+            return ChunkedImage(fileobj, AESGCM(data_key), aad, nonce_prefix, chunk_size, size)
+
+        raise ValueError(f"Unsupported image format version: {version}")
+
+    def decrypt_image(self, stored: bytes, user_id: int) -> bytes:
+        return self.open_image(io.BytesIO(stored), user_id).read()
+
+    def decrypt_legacy_image(self, encrypted_data: bytes, user: BaseUser, user_specific_salt: bytes) -> bytes:
+        """Decrypt a Fernet file written before envelope encryption, using the per-image derived key.
+
+        The key derives from the owner's row, which the caller loads, so this never touches the database.
+        """
+        key = self._derive_key(user, user_specific_salt)
+
         f = Fernet(key)
-        
-        return f.decrypt(encrypted_data) 
\ No newline at end of file
+
+        return f.decrypt(encrypted_data)
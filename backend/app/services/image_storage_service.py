@@ -1,13 +1,45 @@
 import os
 import hashlib
 from pathlib import Path
+from typing import BinaryIO, Optional, Union
 from fastapi import HTTPException
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from ..models.base_user import BaseUser
+from ..models.image_blob import ImageBlob
 from ..models.image_classification import ImageClassification
-from .encryption_service import EncryptionService
+from .encryption_service import EncryptionService, PlainImage, StoredImage
+from .storage_io import storage_io
+from ..db.session import commit_or_flush
+from .segment_store import segment_store, is_segment_location
+from ..core.config import settings
+
+def blob_key(user_id: int, image_hash: str) -> str:
+    return hashlib.sha256(f"{user_id}:{image_hash}".encode()).hexdigest()
+
+def blob_path(storage_path: Path, key: str) -> Path:
+    # Two levels of 256-way fan-out keep directories small
+    return storage_path / key[:2] / key[2:4] / f"{key}.enc"
+
+# Files of released blobs, deleted only once the transaction that released them commits
+RELEASED_FILES = "released_files"
+
+@event.listens_for(Session, "after_commit")
+def _delete_released_files(session):
+    for path in session.info.pop(RELEASED_FILES, []):
+        try:
+            path.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"Error deleting released file {path}: {str(e)}")
+
+@event.listens_for(Session, "after_rollback")
+def _keep_released_files(session):
+    session.info.pop(RELEASED_FILES, None)
 
 class ImageStorageService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         backend_dir = Path(__file__).parent.parent.parent.parent
         self.storage_path = backend_dir / 'storage' / 'images'
@@ -19,63 +51,177 @@ class ImageStorageService:
             print(f"Error creating storage directory: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Failed to create storage directory: {str(e)}")
         
-        self.encryption_service = EncryptionService(db)
+        self.encryption_service = EncryptionService()
 
     async def store_image(self, image_bytes: bytes, classification_id: int) -> str:
         try:
-            classification = self.db.query(ImageClassification).filter(
-                ImageClassification.classification_id == classification_id
-            ).first()
+            classification = await self.db.get(ImageClassification, classification_id)
             
             if not classification:
                 raise HTTPException(status_code=404, detail="Classification not found")
 
-            encrypted_data, user_specific_salt = self.encryption_service.encrypt_image(
-                image_bytes, 
-                classification.user_id
-            )
-
-            filename = f"{classification.image_hash}_{classification_id}.enc"
-            file_path = self.storage_path / filename
-            print(f"Attempting to store image at: {file_path.absolute()}")  # Debug log
+            file_path = await self.write_image(classification, image_bytes)
+            await commit_or_flush(self.db)
 
-            try:
-                with open(file_path, 'wb') as f:
-                    f.write(user_specific_salt)  
-                    f.write(encrypted_data)      
-                print(f"Successfully stored image at: {file_path.absolute()}")
-            except Exception as e:
-                print(f"Error writing file: {str(e)}")
-                raise HTTPException(status_code=500, detail=f"Failed to write image file: {str(e)}")
-
-            classification.image_path = str(file_path)
-            classification.encryption_salt = user_specific_salt.hex()  
-            self.db.commit()
-
-            return str(file_path)
+            return file_path
         except Exception as e:
             print(f"Error in store_image: {str(e)}")  
             raise HTTPException(status_code=500, detail=f"Failed to store image: {str(e)}")
 
-    def get_image_path(self, classification_id: int) -> str:
-        classification = self.db.query(ImageClassification).filter(
-            ImageClassification.classification_id == classification_id
-        ).first()
+    async def write_image(self, classification: ImageClassification, image: Union[bytes, BinaryIO]) -> str:
+        """Point a flushed classification row at its user's blob for these bytes, writing it if new, without committing.
+
+        A file object is read from its current position for classification.file_size bytes.
+        """
+        key = blob_key(classification.user_id, classification.image_hash)
+        blob = await self.db.get(ImageBlob, key)
+        if blob is not None and await storage_io.run("stat", self._blob_exists, blob.image_path):
+            image_path = await self._add_reference(classification, key)
+            if image_path is not None:
+                print(f"Reusing stored image at: {image_path}")  # Debug log
+                return image_path
+            # Released by another request since the lookup; store the bytes as a new blob
+            self.db.expunge(blob)
+            blob = None
+
+        # Chunks are read and encrypted lazily, inside the I/O thread that writes them
+        if isinstance(image, bytes):
+            size = len(image)
+            chunks = self.encryption_service.encrypt_image_chunks(image, classification.user_id)
+        else:
+            size = classification.file_size
+            chunks = self.encryption_service.encrypt_file_chunks(image, size, classification.user_id)
+        try:
+            if settings.STORAGE_ENGINE == "segments" and size <= settings.SEGMENT_MAX_BLOB_BYTES:
+                file_path = await storage_io.run("append", segment_store.append, chunks)
+            else:
+                file_path = blob_path(self.storage_path, key)
+                print(f"Attempting to store image at: {file_path.absolute()}")  # Debug log
+                await storage_io.run("write", storage_io.write_atomic, file_path, chunks)
+            print(f"Successfully stored image at: {file_path}")
+        except Exception as e:
+            print(f"Error writing file: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Failed to write image file: {str(e)}")
+
+        if blob is not None:
+            # The file was lost; a segment write lands somewhere new, so repoint the blob and every row sharing it
+            await self.db.execute(
+                update(ImageClassification).where(ImageClassification.image_path == blob.image_path)
+                .values(image_path=str(file_path))
+                .execution_options(synchronize_session=False)
+            )
+            await self.db.execute(
+                update(ImageBlob).where(ImageBlob.blob_key == key)
+                .values(image_path=str(file_path), file_size=size)
+            )
+        else:
+            try:
+                # Savepoint, so losing a race with a concurrent upload of the same bytes only drops the insert
+                async with self.db.begin_nested():
+                    self.db.add(ImageBlob(
+                        blob_key=key,
+                        user_id=classification.user_id,
+                        image_path=str(file_path),
+                        file_size=size,
+                        ref_count=0
+                    ))
+            except IntegrityError:
+                pass
+
+        image_path = await self._add_reference(classification, key)
+        if image_path is None:
+            raise HTTPException(status_code=500, detail="Failed to store image: its blob was released while writing")
+        return image_path
+
+    async def _add_reference(self, classification: ImageClassification, key: str) -> Optional[str]:
+        """Count one more row against the blob; None if the blob row no longer exists"""
+        result = await self.db.execute(
+            update(ImageBlob).where(ImageBlob.blob_key == key)
+            .values(ref_count=ImageBlob.ref_count + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            return None
+        # Read after the row lock, in case the segment compactor just moved the blob
+        image_path = await self.db.scalar(select(ImageBlob.image_path).where(ImageBlob.blob_key == key))
+        classification.image_path = image_path
+        # Envelope files carry their own wrapped key; a salt marks a legacy file
+        classification.encryption_salt = None
+        return image_path
+
+    @staticmethod
+    def _blob_exists(image_path: str) -> bool:
+        if is_segment_location(image_path):
+            return segment_store.exists(image_path)
+        return os.path.exists(image_path)
+
+    async def release_image(self, classification: ImageClassification) -> None:
+        """Drop a row's reference to its blob and delete the file once nothing points at it, without committing"""
+        if not classification.image_path:
+            return
+
+        blob = await self.db.scalar(
+            select(ImageBlob).where(ImageBlob.image_path == classification.image_path).with_for_update()
+        )
+        classification.image_path = None
+        if blob is None:
+            return
+
+        blob.ref_count -= 1
+        if blob.ref_count <= 0:
+            await self.db.delete(blob)
+            from .thumbnail_service import thumbnail_cache, thumbnail_path
+            thumbnail = thumbnail_path(classification.user_id, classification.image_hash)
+            thumbnail_cache.discard(str(thumbnail))
+
+            released = self.db.sync_session.info.setdefault(RELEASED_FILES, [])
+            released.append(thumbnail)
+            # Packed records become dead space for the segment compactor
+            if not is_segment_location(blob.image_path):
+                released.append(Path(blob.image_path))
+
+    async def get_image_path(self, classification_id: int) -> str:
+        classification = await self.db.get(ImageClassification, classification_id)
         
         if not classification or not classification.image_path:
             raise HTTPException(status_code=404, detail="Image not found")
         
         return classification.image_path
 
-    def get_decrypted_image(self, classification_id: int) -> bytes:
-        classification = self.db.query(ImageClassification).filter(
-            ImageClassification.classification_id == classification_id
-        ).first()
+    async def read_image(self, classification_id: int) -> bytes:
+        image = await self.open_image(classification_id)
+        try:
+            return await storage_io.run("read", image.read)
+        finally:
+            image.close()
+
+    async def open_image(self, classification_id: int) -> StoredImage:
+        """Open a stored image for whole or ranged reads, with the file access done in the storage I/O pool; the caller closes it"""
+        classification = await self._get_stored_classification(classification_id)
+        # Legacy keys derive from the owner's row, which has to be loaded here, not in the I/O thread
+        owner = await self.db.get(BaseUser, classification.user_id) if classification.encryption_salt else None
+        return await storage_io.run("open", self._open_stored, classification, owner)
+
+    async def _get_stored_classification(self, classification_id: int) -> ImageClassification:
+        classification = await self.db.get(ImageClassification, classification_id)
         
         if not classification or not classification.image_path:
             raise HTTPException(status_code=404, detail="Image not found")
 
+        return classification
+
+    def _open_stored(self, classification: ImageClassification, owner: Optional[BaseUser] = None) -> StoredImage:
         try:
+            if is_segment_location(classification.image_path):
+                try:
+                    reader = segment_store.open(classification.image_path)
+                except FileNotFoundError:
+                    raise HTTPException(status_code=404, detail="Image file not found")
+                try:
+                    return self.encryption_service.open_image(reader, classification.user_id)
+                except Exception:
+                    reader.close()
+                    raise
 
             file_path = Path(classification.image_path)
             print(f"Attempting to read image from: {file_path.absolute()}")  
@@ -84,15 +230,24 @@ class ImageStorageService:
                 print(f"File does not exist at: {file_path.absolute()}")
                 raise HTTPException(status_code=404, detail="Image file not found")
 
-            with open(file_path, 'rb') as f:
-                user_specific_salt = f.read(16) 
-                encrypted_data = f.read()      
+            if classification.encryption_salt:
+                # Legacy layout: 16 byte salt followed by a Fernet token
+                with open(file_path, 'rb') as f:
+                    stored = f.read()
+                return PlainImage(self.encryption_service.decrypt_legacy_image(
+                    stored[16:],
+                    owner,
+                    stored[:16]
+                ))
 
-            return self.encryption_service.decrypt_image(
-                encrypted_data,
-                classification.user_id,
-                user_specific_salt
-            )
+            f = open(file_path, 'rb')
+            try:
+                return self.encryption_service.open_image(f, classification.user_id)
+            except Exception:
+                f.close()
+                raise
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"Error in get_decrypted_image: {str(e)}")  
             raise HTTPException(status_code=500, detail=f"Failed to decrypt image: {str(e)}") 
\ No newline at end of file
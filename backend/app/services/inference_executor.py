@@ -0,0 +1,86 @@
+"""
+This file contains the executor pool that keeps CPU inference off the event loop
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from fastapi import HTTPException, status
+
+from ..core.config import settings
+from .model_registry import model_registry
+
+def _set_intra_op_threads(intra_op_threads: int) -> None:
+    # onnxruntime sizes its own pools from the ONNX_* session settings
+    if intra_op_threads > 0 and settings.INFERENCE_BACKEND != "onnxruntime":
+        import torch
+        torch.set_num_threads(intra_op_threads)
+
+def _init_process_worker(intra_op_threads: int) -> None:
+    # Each worker process owns its own copy of the model weights
+    _set_intra_op_threads(intra_op_threads)
+    model_registry.load_all()
+
+class InferenceExecutor:
+    """Bounded thread or process pool for decode and forward passes"""
+
+    def __init__(self, kind: str = settings.INFERENCE_EXECUTOR,
+                 max_workers: int = settings.INFERENCE_WORKERS,
+                 intra_op_threads: int = settings.INFERENCE_INTRA_OP_THREADS,
+                 max_queue_depth: int = settings.INFERENCE_MAX_QUEUE_DEPTH):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor: {kind}")
+
+        self.kind = kind
+        self.max_workers = max_workers
+        self.intra_op_threads = intra_op_threads
+        self.max_queue_depth = max_queue_depth
+        self._pool: Optional[Executor] = None
+        self._pending = 0
+
+    def start(self) -> None:
+        if self._pool is not None:
+            return
+
+        if self.kind == "process":
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(self.intra_op_threads,)
+            )
+        else:
+            # torch's intra-op pool is process-wide, so threads share one setting
+            _set_intra_op_threads(self.intra_op_threads)
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference"
+            )
+
+    async def run(self, fn: Callable, *args):
+        """Run fn(*args) in the pool, rejecting work once the queue is full"""
+        if self._pending >= self.max_queue_depth:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Inference queue is full. Please try again later."
+            )
+
+        self.start()
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            self._pending -= 1
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+inference_executor = InferenceExecutor()
@@ -0,0 +1,80 @@
+"""
+This file contains the dynamic micro-batching inference scheduler
+"""
+import asyncio
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+from ..utils.predictions import format_predictions
+from .model_registry import model_registry
+from .inference_executor import inference_executor
+
+def forward_batch(model_name: str, batch: np.ndarray) -> List[List[dict]]:
+    """Run one forward pass and format top-k predictions for every row"""
+    top_prob, top_class = model_registry.get_predictions(model_name, batch)
+    return [format_predictions(top_prob[i], top_class[i]) for i in range(batch.shape[0])]
+
+class InferenceScheduler:
+    """Collects concurrent single-image requests into one batched forward pass per model"""
+
+    def __init__(self, max_batch_size: int = settings.INFERENCE_MAX_BATCH_SIZE,
+                 max_wait_ms: float = settings.INFERENCE_MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+
+    async def submit(self, model_name: str, image_tensor: np.ndarray) -> List[dict]:
+        """Queue a normalized (1, C, H, W) array and wait for its top-k predictions"""
+        if model_name not in self._queues:
+            self._queues[model_name] = asyncio.Queue()
+            self._workers[model_name] = asyncio.create_task(self._worker(model_name))
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queues[model_name].put((image_tensor, future))
+        return await future
+
+    async def _collect_batch(self, queue: asyncio.Queue) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await queue.get()]
+        deadline = loop.time() + self.max_wait_ms / 1000
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _worker(self, model_name: str) -> None:
+        queue = self._queues[model_name]
+        while True:
+            batch = await self._collect_batch(queue)
+            futures = [future for _, future in batch]
+            try:
+                batch_tensor = np.concatenate([tensor for tensor, _ in batch])
+                predictions = await inference_executor.run(forward_batch, model_name, batch_tensor)
+                for future, prediction in zip(futures, predictions):
+                    if not future.done():
+                        future.set_result(prediction)
+            except Exception as e:
+                print(f"Error in batched inference for {model_name}: {str(e)}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def stop(self) -> None:
+        for task in self._workers.values():
+            task.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._workers.clear()
+        self._queues.clear()
+
+
+inference_scheduler = InferenceScheduler()
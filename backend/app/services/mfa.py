@@ -1,8 +1,9 @@
 """
 This file contains multi factor authentication functions
 """
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..db.session import commit_or_flush
 from ..models.base_user import BaseUser
 from ..utils.totp import (
     generate_totp_secret, 
@@ -13,15 +14,15 @@ from ..utils.totp import (
 
 class MFAService:
     @staticmethod
-    def setup_mfa(db: Session, user_id: int):
+    async def setup_mfa(db: AsyncSession, user_id: int):
         """Setup MFA for a user"""
-        user = db.query(BaseUser).filter(BaseUser.user_id == user_id).first()
+        user = await db.get(BaseUser, user_id)
         if not user:
             return None
 
         secret = generate_totp_secret()
         user.totp_secret = secret
-        db.commit()
+        await commit_or_flush(db)
 
         uri = get_totp_uri(secret, user.username)
         qr_code = get_qr_code_image(uri)
@@ -31,21 +32,21 @@ class MFAService:
         }
 
     @staticmethod
-    def verify_mfa_setup(db: Session, user_id: int, token: str) -> bool:
-        user = db.query(BaseUser).filter(BaseUser.user_id == user_id).first()
+    async def verify_mfa_setup(db: AsyncSession, user_id: int, token: str) -> bool:
+        user = await db.get(BaseUser, user_id)
         if not user or not user.totp_secret:
             return False
         
         if verify_totp(user.totp_secret, token):
             user.mfa_enabled = True
-            db.commit()
+            await commit_or_flush(db)
             return True
         
         return False
 
     @staticmethod
-    def verify_mfa(db: Session, user_id: int, token: str) -> bool:
-        user = db.query(BaseUser).filter(BaseUser.user_id == user_id).first()
+    async def verify_mfa(db: AsyncSession, user_id: int, token: str) -> bool:
+        user = await db.get(BaseUser, user_id)
         if not user or not user.totp_secret or not user.mfa_enabled:
             return False
         return verify_totp(user.totp_secret, token)
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+This file contains the process-wide model registry
+"""
+import hashlib
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+
+MODELS_DIR = Path(__file__).resolve().parent.parent.parent / 'models'
+
+def _torch_model_loaders() -> Dict[str, Callable]:
+    """Maps a weights file stem in backend/models to the loader that restores it"""
+    from ..utils import model as cifar10_resnet20
+    from ..utils import model2 as robust_resnet20
+
+    return {
+        cifar10_resnet20.MODEL_NAME: cifar10_resnet20.load_model,
+        robust_resnet20.MODEL_NAME: robust_resnet20.load_model,
+    }
+
+class ModelRegistry:
+    """Warm eval() models keyed by (name, version), loaded once per process"""
+
+    def __init__(self, models_dir: Path = MODELS_DIR, variants: List[str] = settings.MODEL_VARIANTS,
+                 backend: str = settings.INFERENCE_BACKEND, benchmark: bool = settings.INFERENCE_BENCHMARK_ON_STARTUP):
+        self.models_dir = models_dir
+        self.variants = variants
+        self.backend = backend
+        self.benchmark = benchmark
+        self._models: Dict[Tuple[str, str], object] = {}
+        self._latest: Dict[str, str] = {}
+
+    @staticmethod
+    def _file_version(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()[:12]
+
+    def register(self, name: str, model, version: str = "1") -> None:
+        self._models[(name, version)] = model
+        self._latest[name] = version
+
+    def _add(self, name: str, model, version: str) -> None:
+        """Register an eager model behind the configured inference backend"""
+        from ..utils.inference_backend import apply_backend, benchmark_backends
+
+        cache_key = f"{name}-{version}"
+        if self.benchmark:
+            benchmark_backends(model, cache_key)
+        self.register(name, apply_backend(model, self.backend, cache_key), version)
+
+    def _load_torch(self) -> None:
+        from ..utils.model_optimization import MODEL_VARIANTS, STARTUP_VARIANTS, build_variant, load_scripted, variant_name
+
+        unknown = set(self.variants) - set(MODEL_VARIANTS)
+        if unknown:
+            raise ValueError(f"Unknown model variants: {', '.join(sorted(unknown))}")
+
+        loaders = _torch_model_loaders()
+        for path in sorted(self.models_dir.glob('*.pth')):
+            loader = loaders.get(path.stem)
+            if loader is None:
+                print(f"Skipping unknown model file: {path.name}")
+                continue
+
+            version = self._file_version(path)
+            model = loader(str(path))
+            self._add(path.stem, model, version)
+            print(f"Loaded model {path.stem} (version {version})")
+
+            for variant in self.variants:
+                if variant in STARTUP_VARIANTS:
+                    self._add(variant_name(path.stem, variant), build_variant(model, variant), version)
+                    print(f"Built model variant {variant_name(path.stem, variant)}")
+
+        # Calibrated variants are built offline and stored as TorchScript
+        for path in sorted(self.models_dir.glob('*.pt')):
+            if any(path.stem.endswith(f"_{variant}") for variant in self.variants):
+                version = self._file_version(path)
+                self._add(path.stem, load_scripted(str(path)), version)
+                print(f"Loaded model variant {path.stem} (version {version})")
+
+    def _load_onnx(self) -> None:
+        # Exported by test/export_onnx.py; this path never imports torch
+        from ..utils.onnx_predictor import ONNX_DIR, OnnxPredictor
+
+        for path in sorted(ONNX_DIR.glob('*.onnx')):
+            version = self._file_version(path)
+            self.register(path.stem, OnnxPredictor(str(path)), version)
+            print(f"Loaded ONNX model {path.stem} (version {version})")
+
+    def load_all(self) -> None:
+        """Load every known model file found in the models directory"""
+        if self.backend == 'onnxruntime':
+            self._load_onnx()
+        else:
+            self._load_torch()
+
+    def get(self, name: str, version: Optional[str] = None):
+        version = version or self._latest.get(name)
+        model = self._models.get((name, version))
+        if model is None:
+            raise RuntimeError(f"Model {name} is not loaded in the model registry")
+        return model
+
+    def version(self, name: str) -> str:
+        """Hash of the weights behind the model get(name) returns"""
+        version = self._latest.get(name)
+        if version is None:
+            raise RuntimeError(f"Model {name} is not loaded in the model registry")
+        return version
+
+    def get_predictions(self, name: str, batch: np.ndarray):
+        """Top-k probabilities and classes for a normalized (N, 3, 32, 32) batch"""
+        model = self.get(name)
+        if self.backend == 'onnxruntime':
+            from ..utils.onnx_predictor import get_predictions
+            return get_predictions(model, batch)
+
+        import torch
+        from ..utils.model import get_predictions
+        return get_predictions(model, torch.from_numpy(batch))
+
+    def list_models(self) -> List[Tuple[str, str]]:
+        return list(self._models.keys())
+
+    def clear(self) -> None:
+        self._models.clear()
+        self._latest.clear()
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,174 @@
+"""
+This file contains the content-hash result cache for classifications
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..db.session import AsyncSessionLocal
+from ..models.enums import ClassificationStatusEnum
+from ..models.image_classification import ImageClassification
+
+# (image_hash, model_used, model_version)
+CacheKey = Tuple[str, str, str]
+
+class ResultCache:
+    """In-memory LRU with TTL in front of earlier classification rows, with in-flight coalescing"""
+
+    def __init__(self, max_entries: int = settings.RESULT_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = settings.RESULT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, Tuple[float, dict]]" = OrderedDict()
+        self._in_flight: Dict[CacheKey, asyncio.Future] = {}
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def _get(self, key: CacheKey) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key: CacheKey, value: dict) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _reusable(model_used: str, model_version: str):
+        # A result from other weights under the same model name is stale
+        return (
+            ImageClassification.model_used == model_used,
+            ImageClassification.model_version == model_version,
+            ImageClassification.top_prediction.isnot(None),
+            ImageClassification.status != ClassificationStatusEnum.error
+        )
+
+    @classmethod
+    async def _lookup_db(cls, db: AsyncSession, key: CacheKey) -> Optional[dict]:
+        # Served by ix_image_classification_hash_model, shared by every worker
+        image_hash, model_used, model_version = key
+        previous = await db.scalar(
+            select(ImageClassification)
+            .where(ImageClassification.image_hash == image_hash, *cls._reusable(model_used, model_version))
+            .order_by(ImageClassification.classification_id.desc())
+            .limit(1)
+        )
+        if previous is None:
+            return None
+        return {"class": previous.top_prediction, "probability": float(previous.confidence_score)}
+
+    def put(self, image_hash: str, model_used: str, model_version: str, value: dict) -> None:
+        self._put((image_hash, model_used, model_version), value)
+
+    async def get_many(self, db: AsyncSession, image_hashes: Sequence[str], model_used: str,
+                       model_version: str) -> Dict[str, dict]:
+        """Known top predictions for a batch of images: memory first, then one query for the rest"""
+        found: Dict[str, dict] = {}
+        missing = set()
+        for image_hash in image_hashes:
+            value = self._get((image_hash, model_used, model_version))
+            if value is not None:
+                self.memory_hits += 1
+                found[image_hash] = value
+            else:
+                missing.add(image_hash)
+
+        if missing:
+            latest = (
+                select(func.max(ImageClassification.classification_id))
+                .where(ImageClassification.image_hash.in_(missing), *self._reusable(model_used, model_version))
+                .group_by(ImageClassification.image_hash)
+            )
+            rows = await db.execute(
+                select(ImageClassification.image_hash, ImageClassification.top_prediction, ImageClassification.confidence_score)
+                .where(ImageClassification.classification_id.in_(latest))
+            )
+            for image_hash, top_prediction, confidence_score in rows:
+                value = {"class": top_prediction, "probability": float(confidence_score)}
+                self._put((image_hash, model_used, model_version), value)
+                found[image_hash] = value
+            self.db_hits += sum(1 for image_hash in missing if image_hash in found)
+            self.misses += sum(1 for image_hash in missing if image_hash not in found)
+        return found
+
+    async def get_or_compute(self, image_hash: str, model_used: str, model_version: str,
+                             compute: Callable[[], Awaitable[dict]]) -> dict:
+        """Top prediction for the image, computing it at most once across concurrent identical uploads"""
+        key = (image_hash, model_used, model_version)
+
+        value = self._get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            try:
+                # shield so a cancelled waiter does not cancel the shared computation
+                return await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                if not in_flight.cancelled():
+                    # This waiter itself was cancelled
+                    raise
+            # The leading request was cancelled mid-computation; start over, leading if nobody else is
+            return await self.get_or_compute(image_hash, model_used, model_version, compute)
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark a failure as retrieved even when no other request was waiting on it
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[key] = future
+        try:
+            # In a short session of its own: the caller's would keep a connection checked out through compute()
+            async with AsyncSessionLocal() as db:
+                value = await self._lookup_db(db, key)
+            if value is not None:
+                self.db_hits += 1
+            else:
+                self.misses += 1
+                value = await compute()
+            self._put(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.db_hits + self.coalesced + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_ratio": (lookups - self.misses) / lookups if lookups else 0.0
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+result_cache = ResultCache()
@@ -0,0 +1,55 @@
+"""
+This file contains the listing totals served without a count(*) per request
+"""
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..utils.pagination import TotalMode
+
+class RowCountCache:
+    """Exact table counts reused for a short TTL, per worker"""
+
+    def __init__(self, ttl_seconds: float = settings.LISTING_COUNT_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._counts: Dict[str, Tuple[float, int]] = {}
+
+    async def get(self, db: AsyncSession, model) -> int:
+        table = model.__tablename__
+        entry = self._counts.get(table)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        count = await db.scalar(select(func.count()).select_from(model))
+        self._counts[table] = (time.monotonic() + self.ttl_seconds, count)
+        return count
+
+    def clear(self) -> None:
+        self._counts.clear()
+
+
+row_counts = RowCountCache()
+
+async def _planner_estimate(db: AsyncSession, model) -> Optional[int]:
+    if db.bind.dialect.name != "postgresql":
+        return None
+    # reltuples is -1 until the table is first vacuumed or analyzed
+    estimate = await db.scalar(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+        {"table": model.__tablename__}
+    )
+    return estimate if estimate is not None and estimate >= 0 else None
+
+async def count_rows(db: AsyncSession, model, mode: TotalMode) -> Tuple[Optional[int], bool]:
+    """Total rows of a listing's table, and whether it is an estimate"""
+    if mode == TotalMode.none:
+        return None, False
+    if mode == TotalMode.exact:
+        return await db.scalar(select(func.count()).select_from(model)), False
+    if mode == TotalMode.approximate:
+        estimate = await _planner_estimate(db, model)
+        if estimate is not None:
+            return estimate, True
+    return await row_counts.get(db, model), True
@@ -0,0 +1,196 @@
+"""
+This file contains the append-only segment engine for small encrypted images
+"""
+import asyncio
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..models.image_blob import ImageBlob
+from ..models.image_classification import ImageClassification
+from .storage_io import storage_io
+
+SEGMENTS_DIR = Path(__file__).resolve().parent.parent.parent.parent / 'storage' / 'segments'
+
+# image_path of a packed blob: "segment:<segment file>:<data offset>:<length>"
+LOCATION_PREFIX = "segment:"
+# Every record is framed so a segment can be rescanned without the DB index
+RECORD_MAGIC = b"SEG1"
+RECORD_HEADER = struct.Struct(">4sQ")
+
+def is_segment_location(location: str) -> bool:
+    return location.startswith(LOCATION_PREFIX)
+
+def parse_location(location: str):
+    name, offset, length = location[len(LOCATION_PREFIX):].split(":")
+    return name, int(offset), int(length)
+
+class SegmentReader:
+    """Read-only file object over one record, backed by pread on the segment"""
+
+    def __init__(self, path: Path, offset: int, length: int):
+        self._fd = os.open(path, os.O_RDONLY)
+        self._offset = offset
+        self._length = length
+        self._position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = self._length - self._position
+        size = remaining if size is None or size < 0 else min(size, remaining)
+        data = os.pread(self._fd, size, self._offset + self._position)
+        self._position += len(data)
+        return data
+
+    def seek(self, position: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._position, os.SEEK_END: self._length}[whence]
+        self._position = base + position
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+class SegmentStore:
+    """Appends blobs to large per-process segment files; the DB image_path is the offset index"""
+
+    def __init__(self, segments_dir: Path = SEGMENTS_DIR,
+                 max_segment_bytes: int = settings.SEGMENT_MAX_BYTES,
+                 seal_idle_seconds: float = settings.SEGMENT_SEAL_IDLE_SECONDS):
+        self.segments_dir = segments_dir
+        self.max_segment_bytes = max_segment_bytes
+        self.seal_idle_seconds = seal_idle_seconds
+        self._lock = threading.Lock()
+        self._active: Optional[Path] = None
+        self._fd = -1
+        self._size = 0
+        self._last_append = 0.0
+        self._sequence = 0
+
+    def _roll(self) -> None:
+        # Segments are never shared between processes, so appends need no file locks
+        if self._fd >= 0:
+            os.close(self._fd)
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        self._sequence += 1
+        self._active = self.segments_dir / f"{int(time.time())}-{os.getpid()}-{self._sequence}.seg"
+        self._fd = os.open(self._active, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        self._size = 0
+
+    def append(self, chunks: Iterable[bytes]) -> str:
+        """Append one blob and return its location (blocking)"""
+        data = b"".join(chunks)
+        record = RECORD_HEADER.pack(RECORD_MAGIC, len(data)) + data
+
+        with self._lock:
+            # Roll well before the compactor's idle cutoff, so it never sees an active segment as sealed
+            idle = time.monotonic() - self._last_append > self.seal_idle_seconds / 2
+            if self._fd < 0 or idle or self._size + len(record) > self.max_segment_bytes:
+                self._roll()
+
+            offset = self._size
+            os.pwrite(self._fd, record, offset)
+            self._size += len(record)
+            self._last_append = time.monotonic()
+            storage_io.commit_write(self._active, self._fd)
+            return f"{LOCATION_PREFIX}{self._active.name}:{offset + RECORD_HEADER.size}:{len(data)}"
+
+    def open(self, location: str) -> SegmentReader:
+        name, offset, length = parse_location(location)
+        return SegmentReader(self.segments_dir / name, offset, length)
+
+    def exists(self, location: str) -> bool:
+        return (self.segments_dir / parse_location(location)[0]).exists()
+
+    def _sealed_segments(self):
+        cutoff = time.time() - self.seal_idle_seconds
+        for path in sorted(self.segments_dir.glob('*.seg')):
+            if path == self._active:
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    yield path
+            except FileNotFoundError:
+                # Compacted by another worker since the glob
+                continue
+
+    def compact(self, db: Session, min_dead_ratio: float = settings.SEGMENT_COMPACT_MIN_DEAD_RATIO) -> dict:
+        """Copy live records out of mostly-dead sealed segments, repoint their rows, then drop the segments (blocking)"""
+        compacted = reclaimed = moved = 0
+        for path in self._sealed_segments():
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                # Another worker compacted it after the listing
+                continue
+            blobs = db.query(ImageBlob)\
+                .filter(ImageBlob.image_path.like(f"{LOCATION_PREFIX}{path.name}:%"))\
+                .with_for_update()\
+                .all()
+            live_bytes = sum(RECORD_HEADER.size + parse_location(blob.image_path)[2] for blob in blobs)
+            if size and 1 - live_bytes / size < min_dead_ratio:
+                db.rollback()
+                continue
+
+            destinations = set()
+            for blob in blobs:
+                reader = self.open(blob.image_path)
+                try:
+                    location = self.append([reader.read()])
+                finally:
+                    reader.close()
+                destinations.add(self.segments_dir / parse_location(location)[0])
+                db.query(ImageClassification)\
+                    .filter(ImageClassification.image_path == blob.image_path)\
+                    .update({ImageClassification.image_path: location}, synchronize_session=False)
+                blob.image_path = location
+
+            # The copies must be on disk before rows point at them and the old segment goes,
+            # even under the none and batched fsync policies
+            storage_io.sync(destinations)
+            db.commit()
+
+            # Readers that already opened the old segment keep their fd until they finish
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                # Another worker compacted it while we waited on its row locks; its blobs were already moved
+                continue
+            compacted += 1
+            moved += len(blobs)
+            reclaimed += size - live_bytes
+
+        return {"segments_compacted": compacted, "blobs_moved": moved, "bytes_reclaimed": reclaimed}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd >= 0:
+                os.close(self._fd)
+            self._fd = -1
+            self._active = None
+
+
+segment_store = SegmentStore()
+
+async def run_compactor(interval_seconds: float = settings.SEGMENT_COMPACT_INTERVAL_SECONDS) -> None:
+    """Background task that periodically compacts sealed segments"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        db = SessionLocal()
+        try:
+            result = await storage_io.run("compact", segment_store.compact, db)
+            print(f"Segment compaction: {result}")
+        except Exception as e:
+            print(f"Error compacting segments: {str(e)}")
+        finally:
+            db.close()
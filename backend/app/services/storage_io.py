@@ -0,0 +1,176 @@
+"""
+This file contains the bounded I/O pool that keeps image file access off the event loop
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterable, Optional, Set
+
+from ..core.config import settings
+
+FSYNC_POLICIES = ("none", "file", "batched")
+LATENCY_WINDOW = 1024
+
+def _fsync_path(path: Path) -> None:
+    # Directories need an fd too, so that a rename into them is durable
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class OperationStats:
+    """Count, errors and a rolling latency window for one kind of storage operation"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, elapsed_ms: float, failed: bool) -> None:
+        self.count += 1
+        self.errors += int(failed)
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.recent_ms.append(elapsed_ms)
+
+    def snapshot(self) -> dict:
+        recent = sorted(self.recent_ms)
+
+        def percentile(p: float) -> float:
+            return recent[min(int(p * len(recent)), len(recent) - 1)] if recent else 0.0
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": self.max_ms
+        }
+
+class StorageIO:
+    """Thread pool for blocking file reads and writes, with an fsync policy and per-op latency"""
+
+    def __init__(self, max_workers: int = settings.STORAGE_IO_WORKERS,
+                 fsync_policy: str = settings.STORAGE_FSYNC_POLICY,
+                 fsync_batch_ms: float = settings.STORAGE_FSYNC_BATCH_MS):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown storage fsync policy: {fsync_policy}")
+
+        self.max_workers = max_workers
+        self.fsync_policy = fsync_policy
+        self.fsync_batch_ms = fsync_batch_ms
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._stats: Dict[str, OperationStats] = defaultdict(OperationStats)
+
+        self._unsynced: Set[Path] = set()
+        self._unsynced_lock = threading.Lock()
+        self._stop_flusher = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._pool is not None:
+            return
+
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="storage-io")
+        if self.fsync_policy == "batched":
+            self._stop_flusher.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, name="storage-fsync", daemon=True)
+            self._flusher.start()
+
+    async def run(self, operation: str, fn: Callable, *args):
+        """Run fn(*args) in the I/O pool and record its latency under operation"""
+        self.start()
+        start = time.perf_counter()
+        failed = False
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._stats[operation].record((time.perf_counter() - start) * 1000, failed)
+
+    def write_atomic(self, path: Path, chunks: Iterable[bytes]) -> None:
+        """Write to a temp file in the same directory, then rename over path (blocking)"""
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                if self.fsync_policy == "file":
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+        if self.fsync_policy == "file":
+            _fsync_path(path.parent)
+        elif self.fsync_policy == "batched":
+            with self._unsynced_lock:
+                self._unsynced.add(path)
+
+    def commit_write(self, path: Path, fd: int) -> None:
+        """Apply the fsync policy to an in-place write on an open fd (blocking)"""
+        if self.fsync_policy == "file":
+            os.fsync(fd)
+        elif self.fsync_policy == "batched":
+            with self._unsynced_lock:
+                self._unsynced.add(path)
+
+    def flush(self) -> None:
+        """fsync every file written since the last flush, and their directories (blocking)"""
+        with self._unsynced_lock:
+            paths, self._unsynced = self._unsynced, set()
+        self.sync(paths)
+
+    @staticmethod
+    def sync(paths: Iterable[Path]) -> None:
+        """fsync these files and their directories now, whatever the policy (blocking)"""
+        paths = set(paths)
+        for path in paths:
+            try:
+                _fsync_path(path)
+            except FileNotFoundError:
+                continue
+        for directory in {path.parent for path in paths}:
+            _fsync_path(directory)
+
+    def _flush_loop(self) -> None:
+        # Batched policy: a write is durable within fsync_batch_ms instead of before it returns
+        while not self._stop_flusher.wait(self.fsync_batch_ms / 1000):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Error flushing storage writes: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "fsync_policy": self.fsync_policy,
+            "workers": self.max_workers,
+            "operations": {operation: stats.snapshot() for operation, stats in self._stats.items()}
+        }
+
+    def shutdown(self) -> None:
+        if self._flusher is not None:
+            self._stop_flusher.set()
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+storage_io = StorageIO()
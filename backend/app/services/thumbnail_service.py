@@ -0,0 +1,133 @@
+"""
+This file contains the encrypted preview derivatives served to history views
+"""
+import asyncio
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..models.image_classification import ImageClassification
+from ..utils.thumbnail import render_thumbnail
+from .encryption_service import EncryptionService
+from .image_storage_service import ImageStorageService, blob_key, blob_path
+from .inference_executor import inference_executor
+from .storage_io import storage_io
+
+THUMBNAILS_DIR = Path(__file__).resolve().parent.parent.parent.parent / 'storage' / 'thumbnails'
+
+def thumbnail_path(user_id: int, image_hash: str, size: int = settings.THUMBNAIL_SIZE) -> Path:
+    # Keyed like the blob, so every deduplicated row shares one preview
+    return blob_path(THUMBNAILS_DIR, f"{blob_key(user_id, image_hash)}_{size}")
+
+class ThumbnailCache:
+    """Decrypted previews in an LRU bounded by total bytes"""
+
+    def __init__(self, max_bytes: int = settings.THUMBNAIL_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self._entries.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key))
+        self._entries[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def discard(self, key: str) -> None:
+        data = self._entries.pop(key, None)
+        if data is not None:
+            self._bytes -= len(data)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+
+thumbnail_cache = ThumbnailCache()
+_pending_renders: Set[asyncio.Task] = set()
+
+def _read_thumbnail(path: Path, user_id: int, encryption_service: EncryptionService) -> Optional[bytes]:
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        image = encryption_service.open_image(f, user_id)
+    except Exception:
+        f.close()
+        raise
+    try:
+        return image.read()
+    finally:
+        image.close()
+
+async def store_thumbnail(user_id: int, image_hash: str, image_bytes: bytes,
+                          encryption_service: EncryptionService) -> bytes:
+    """Render, encrypt and write the preview for an image, without touching the DB"""
+    thumbnail = await inference_executor.run(render_thumbnail, image_bytes)
+    return await write_thumbnail(user_id, image_hash, thumbnail, encryption_service)
+
+async def write_thumbnail(user_id: int, image_hash: str, thumbnail: bytes,
+                          encryption_service: EncryptionService) -> bytes:
+    await storage_io.run(
+        "write",
+        storage_io.write_atomic,
+        thumbnail_path(user_id, image_hash),
+        encryption_service.encrypt_image_chunks(thumbnail, user_id)
+    )
+    thumbnail_cache.put(str(thumbnail_path(user_id, image_hash)), thumbnail)
+    return thumbnail
+
+def schedule_thumbnail(user_id: int, image_hash: str, image_bytes: bytes) -> None:
+    """Render a preview in the background right after an upload (THUMBNAIL_ON_UPLOAD)"""
+    # Encryption only needs the cached per-user key, never the request's session
+    _track(asyncio.create_task(store_thumbnail(user_id, image_hash, image_bytes, EncryptionService())))
+
+def schedule_thumbnail_write(user_id: int, image_hash: str, thumbnail: bytes) -> None:
+    """Encrypt and write an already rendered preview in the background"""
+    _track(asyncio.create_task(write_thumbnail(user_id, image_hash, thumbnail, EncryptionService())))
+
+def _track(task: asyncio.Task) -> None:
+    _pending_renders.add(task)
+    task.add_done_callback(_pending_renders.discard)
+
+class ThumbnailService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.image_storage = ImageStorageService(db)
+
+    async def get_thumbnail(self, classification: ImageClassification) -> bytes:
+        """Cached preview, else the stored one, else render it from the original once"""
+        path = thumbnail_path(classification.user_id, classification.image_hash)
+        thumbnail = thumbnail_cache.get(str(path))
+        if thumbnail is not None:
+            return thumbnail
+
+        encryption_service = self.image_storage.encryption_service
+        thumbnail = await storage_io.run("read", _read_thumbnail, path, classification.user_id, encryption_service)
+        if thumbnail is not None:
+            thumbnail_cache.put(str(path), thumbnail)
+            return thumbnail
+
+        image_bytes = await self.image_storage.read_image(classification.classification_id)
+        return await store_thumbnail(classification.user_id, classification.image_hash, image_bytes, encryption_service)
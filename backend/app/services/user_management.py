@@ -1,4 +1,6 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db.session import commit_or_flush
 from ..schemas.user_management import UserUpdate, UserUpdateResponse, UserListResponse
 from ..models.base_user import BaseUser
 from fastapi import HTTPException, status
@@ -8,8 +10,8 @@ from typing import List
 class UserManagementService:
 
     @staticmethod
-    def update_user(db: Session, user_id: int, user: UserUpdate) -> UserUpdateResponse:
-        user_data = db.query(BaseUser).filter(BaseUser.user_id == user_id).first()
+    async def update_user(db: AsyncSession, user_id: int, user: UserUpdate) -> UserUpdateResponse:
+        user_data = await db.get(BaseUser, user_id)
         if not user_data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -30,22 +32,21 @@ class UserManagementService:
             user_data.locked_until = None
         
         try:
-            db.commit()
-            db.refresh(user_data)
+            await commit_or_flush(db)
             return UserUpdateResponse(
                 success=True,
                 message="User updated successfully"
             )
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error updating user: {str(e)}"
             )
         
     @staticmethod
-    def get_user_list(db: Session) -> List[UserListResponse]:
-        users = db.query(BaseUser).filter(BaseUser.user_type == UserTypeEnum.user).all()
+    async def get_user_list(db: AsyncSession) -> List[UserListResponse]:
+        users = (await db.scalars(select(BaseUser).where(BaseUser.user_type == UserTypeEnum.user))).all()
         return [
             UserListResponse(
                 user_id=user.user_id,
@@ -0,0 +1,45 @@
+"""
+This file contains streaming readers for tar and zip uploads of many images
+"""
+import tarfile
+import zipfile
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+# (member name, image bytes or None, error message or None)
+ArchiveItem = Tuple[str, Optional[bytes], Optional[str]]
+
+def _iter_zip(fileobj: BinaryIO, max_member_bytes: int) -> Iterator[ArchiveItem]:
+    # zip needs the central directory at the end, so it reads from the spooled upload file
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            if info.file_size > max_member_bytes:
+                yield info.filename, None, f"File exceeds the {max_member_bytes} byte limit"
+                continue
+            yield info.filename, archive.read(info), None
+
+def _iter_tar(fileobj: BinaryIO, max_member_bytes: int) -> Iterator[ArchiveItem]:
+    # Stream mode ("r|*") reads members sequentially and never seeks back
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            if member.size > max_member_bytes:
+                yield member.name, None, f"File exceeds the {max_member_bytes} byte limit"
+                continue
+            yield member.name, archive.extractfile(member).read(), None
+
+def iter_archive_images(fileobj: BinaryIO, max_member_bytes: int) -> Iterator[ArchiveItem]:
+    """Yield archive members one at a time, so only the current member is held in memory"""
+    fileobj.seek(0)
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        yield from _iter_zip(fileobj, max_member_bytes)
+        return
+
+    fileobj.seek(0)
+    try:
+        yield from _iter_tar(fileobj, max_member_bytes)
+    except tarfile.TarError as e:
+        raise ValueError(f"Archive is not a valid tar or zip file: {str(e)}")
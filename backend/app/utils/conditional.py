@@ -0,0 +1,29 @@
+"""
+This file contains ETag helpers for answering conditional GETs with 304
+"""
+import hashlib
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# Revalidate on every use, so ownership and role checks still run before a 304
+REVALIDATE = "private, no-cache"
+
+def listing_etag(*parts) -> str:
+    """Weak validator for a listing, from its version token, owner and query parameters"""
+    digest = hashlib.sha256(":".join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check using the weak comparison RFC 9110 requires for it"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+def not_modified(etag: str, cache_control: str = REVALIDATE) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
@@ -0,0 +1,37 @@
+"""
+This file contains HTTP Range header parsing for streamed downloads
+"""
+from typing import Optional, Tuple
+
+class RangeNotSatisfiableError(ValueError):
+    pass
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) for a single bytes range, or None to serve the whole body.
+
+    Malformed and multi-range headers are ignored, as RFC 9110 allows.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            suffix = int(end_text)
+            if suffix == 0:
+                raise RangeNotSatisfiableError("Empty suffix range")
+            start, end = max(size - suffix, 0), size - 1
+    except ValueError as e:
+        if isinstance(e, RangeNotSatisfiableError):
+            raise
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiableError(f"Range start {start} is past the end of a {size} byte body")
+    if end < start:
+        return None
+    return start, min(end, size - 1)
@@ -0,0 +1,119 @@
+"""
+This file contains the compiled inference backends used behind get_predictions
+"""
+import os
+import time
+from pathlib import Path
+from typing import Dict
+
+import torch
+import torch.nn as nn
+
+from .preprocessing import IMAGE_SIZE
+
+INFERENCE_BACKENDS = ('eager', 'torchscript', 'compile')
+COMPILED_DIR = Path(__file__).resolve().parent.parent.parent / 'models' / 'compiled'
+BENCHMARK_BATCH_SIZES = (1, 32)
+BENCHMARK_REPEATS = 20
+
+def _artifact_path(cache_key: str, suffix: str) -> Path:
+    # Artifacts are only valid for the torch build that produced them
+    return COMPILED_DIR / f"{cache_key}-torch{torch.__version__}.{suffix}"
+
+def _temp_path(path: Path) -> Path:
+    # Per process, so workers building the same artifact at startup never share a temp file
+    return path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+def _warm_up(model: nn.Module) -> None:
+    with torch.no_grad():
+        for batch_size in BENCHMARK_BATCH_SIZES:
+            model(torch.zeros(batch_size, 3, IMAGE_SIZE, IMAGE_SIZE))
+
+def to_torchscript(model: nn.Module, cache_key: str) -> nn.Module:
+    """torch.jit.trace + freeze + optimize_for_inference, with the frozen module cached on disk"""
+    path = _artifact_path(cache_key, 'torchscript.pt')
+    if path.exists():
+        frozen = torch.jit.load(str(path), map_location='cpu').eval()
+    else:
+        example = torch.zeros(1, 3, IMAGE_SIZE, IMAGE_SIZE)
+        with torch.no_grad():
+            frozen = torch.jit.freeze(torch.jit.trace(model.eval(), example))
+
+        COMPILED_DIR.mkdir(parents=True, exist_ok=True)
+        # Written aside and renamed, so a crash or a concurrent load never sees a partial file
+        tmp_path = _temp_path(path)
+        torch.jit.save(frozen, str(tmp_path))
+        os.replace(tmp_path, path)
+
+    # optimize_for_inference prepacks weights for this machine and cannot be serialized
+    return torch.jit.optimize_for_inference(frozen)
+
+def to_compiled(model: nn.Module, cache_key: str) -> nn.Module:
+    """torch.compile with inductor on CPU, reusing persisted inductor cache artifacts"""
+    path = _artifact_path(cache_key, 'inductor.bin')
+    if path.exists():
+        torch.compiler.load_cache_artifacts(path.read_bytes())
+
+    compiled = torch.compile(model.eval(), backend='inductor', dynamic=True)
+    _warm_up(compiled)
+
+    if not path.exists():
+        artifacts = torch.compiler.save_cache_artifacts()
+        if artifacts is not None:
+            COMPILED_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_path = _temp_path(path)
+            tmp_path.write_bytes(artifacts[0])
+            os.replace(tmp_path, path)
+    return compiled
+
+def apply_backend(model: nn.Module, backend: str, cache_key: str) -> nn.Module:
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+
+    # Calibrated variants are already stored as frozen TorchScript
+    if backend == 'eager' or isinstance(model, torch.jit.ScriptModule):
+        return model
+    if backend == 'torchscript':
+        return to_torchscript(model, cache_key)
+    return to_compiled(model, cache_key)
+
+def measure_latency_ms(model: nn.Module, batch_size: int, repeats: int = BENCHMARK_REPEATS) -> float:
+    batch = torch.randn(batch_size, 3, IMAGE_SIZE, IMAGE_SIZE)
+    with torch.no_grad():
+        model(batch)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(batch)
+    return (time.perf_counter() - start) / repeats * 1000
+
+def benchmark_backends(model: nn.Module, cache_key: str) -> Dict[str, Dict[int, float]]:
+    """Print batch-1 and batch-32 latency of the model under every backend"""
+    results = {}
+    for backend in INFERENCE_BACKENDS:
+        try:
+            candidate = apply_backend(model, backend, cache_key)
+            results[backend] = {
+                batch_size: measure_latency_ms(candidate, batch_size)
+                for batch_size in BENCHMARK_BATCH_SIZES
+            }
+        except Exception as e:
+            print(f"Backend {backend} failed for {cache_key}: {str(e)}")
+            continue
+
+        timings = ", ".join(f"batch {b}: {ms:.2f} ms" for b, ms in results[backend].items())
+        print(f"[{cache_key}] {backend:<12} {timings}")
+    return results
+
+def export_onnx(model: nn.Module, path: str, opset_version: int = 17) -> None:
+    """Export to ONNX with a dynamic batch dimension for the onnxruntime backend"""
+    example = torch.zeros(1, 3, IMAGE_SIZE, IMAGE_SIZE)
+    torch.onnx.export(
+        model.eval(),
+        (example,),
+        path,
+        input_names=['input'],
+        output_names=['logits'],
+        dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+        opset_version=opset_version,
+        dynamo=False
+    )
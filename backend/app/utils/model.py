@@ -1,27 +1,113 @@
 import torch
-import torchvision.transforms as transforms
-from PIL import Image
-import io
+import torch.nn as nn
+import os
+import pickle
+from .preprocessing import image_preprocessor
+from .predictions import format_predictions
 
-def load_model():
-    model = torch.hub.load('chenyaofo/pytorch-cifar-models', 'cifar10_resnet20', pretrained=True)
+HUB_REPO = 'chenyaofo/pytorch-cifar-models'
+MODEL_NAME = 'cifar10_resnet20'
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'models', f'{MODEL_NAME}.pth')
+
+
+# Local mirror of the torch hub architecture so the pickled model in
+# backend/models can be restored without importing the hub repository.
+def conv3x3(in_planes, out_planes, stride=1):
+    return nn.Conv2d(in_planes, out_planes, kernel_size=3, stride=stride, padding=1, bias=False)
+
+def conv1x1(in_planes, out_planes, stride=1):
+    return nn.Conv2d(in_planes, out_planes, kernel_size=1, stride=stride, bias=False)
+
+class BasicBlock(nn.Module):
+    expansion = 1
+
+    def __init__(self, inplanes, planes, stride=1, downsample=None):
+        super(BasicBlock, self).__init__()
+        self.conv1 = conv3x3(inplanes, planes, stride)
+        self.bn1 = nn.BatchNorm2d(planes)
+        self.relu = nn.ReLU(inplace=True)
+        self.conv2 = conv3x3(planes, planes)
+        self.bn2 = nn.BatchNorm2d(planes)
+        self.downsample = downsample
+        self.stride = stride
+
+    def forward(self, x):
+        identity = x
+
+        out = self.relu(self.bn1(self.conv1(x)))
+        out = self.bn2(self.conv2(out))
+
+        if self.downsample is not None:
+            identity = self.downsample(x)
+
+        out += identity
+        out = self.relu(out)
+        return out
+
+class CifarResNet(nn.Module):
+    def __init__(self, block, layers, num_classes=10):
+        super(CifarResNet, self).__init__()
+        self.inplanes = 16
+        self.conv1 = conv3x3(3, 16)
+        self.bn1 = nn.BatchNorm2d(16)
+        self.relu = nn.ReLU(inplace=True)
+
+        self.layer1 = self._make_layer(block, 16, layers[0])
+        self.layer2 = self._make_layer(block, 32, layers[1], stride=2)
+        self.layer3 = self._make_layer(block, 64, layers[2], stride=2)
+
+        self.avgpool = nn.AdaptiveAvgPool2d((1, 1))
+        self.fc = nn.Linear(64 * block.expansion, num_classes)
+
+    def _make_layer(self, block, planes, blocks, stride=1):
+        downsample = None
+        if stride != 1 or self.inplanes != planes * block.expansion:
+            downsample = nn.Sequential(
+                conv1x1(self.inplanes, planes * block.expansion, stride),
+                nn.BatchNorm2d(planes * block.expansion),
+            )
+
+        layers = [block(self.inplanes, planes, stride, downsample)]
+        self.inplanes = planes * block.expansion
+        for _ in range(1, blocks):
+            layers.append(block(self.inplanes, planes))
+        return nn.Sequential(*layers)
+
+    def forward(self, x):
+        x = self.relu(self.bn1(self.conv1(x)))
+        x = self.layer1(x)
+        x = self.layer2(x)
+        x = self.layer3(x)
+        x = self.avgpool(x)
+        x = torch.flatten(x, 1)
+        x = self.fc(x)
+        return x
+
+class _HubUnpickler(pickle.Unpickler):
+    """Resolve classes pickled from the hub package to the local mirror above"""
+    def find_class(self, module, name):
+        if module == 'pytorch_cifar_models.resnet':
+            module = __name__
+        return super().find_class(module, name)
+
+class _hub_pickle:
+    Unpickler = _HubUnpickler
+    load = pickle.load
+
+def load_model(model_path=MODEL_PATH):
+    if os.path.exists(model_path):
+        model = torch.load(model_path, map_location='cpu', pickle_module=_hub_pickle, weights_only=False)
+    else:
+        model = torch.hub.load(HUB_REPO, MODEL_NAME, pretrained=True)
     model.eval()
     return model
 
 def preprocess_image(image_bytes):
-    # Convert bytes to PIL Image and ensure RGB
-    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    
-    # Define transformations
-    transform = transforms.Compose([
-        transforms.Resize((32, 32)),
-        transforms.ToTensor(),
-        transforms.Normalize((0.4914, 0.4822, 0.4465), (0.2023, 0.1994, 0.2010))
-    ])
-    
-    # Apply transformations
-    image_tensor = transform(image).unsqueeze(0)
-    return image_tensor
+    # Decode, resize and normalize through the shared batch pipeline
+    return torch.from_numpy(image_preprocessor.preprocess(image_bytes))
+
+def preprocess_images(images):
+    return torch.from_numpy(image_preprocessor.preprocess_batch(images))
 
 def get_predictions(model, image_tensor):
     with torch.no_grad():
@@ -34,26 +120,17 @@ def get_class_names():
     return ['airplane', 'automobile', 'bird', 'cat', 'deer',
             'dog', 'frog', 'horse', 'ship', 'truck']
 
-def classify_image(image_bytes):
-    
-    # Load model
-    model = load_model()
-    
+def classify_image(image_bytes, model=None):
+
+    # Load model, unless a warm one is borrowed from the model registry
+    if model is None:
+        model = load_model()
+
     # Preprocess image
     image_tensor = preprocess_image(image_bytes)
-    
+
     # Get predictions
     top_prob, top_class = get_predictions(model, image_tensor)
-    
-    # Get class names
-    class_names = get_class_names()
-    
+
     # Format predictions
-    predictions = []
-    for i in range(len(top_prob[0])):
-        predictions.append({
-            "class": class_names[top_class[0][i].item()],
-            "probability": float(top_prob[0][i].item())
-        })
-    
-    return predictions 
\ No newline at end of file
+    return format_predictions(top_prob[0], top_class[0])
\ No newline at end of file
@@ -10,6 +10,7 @@ import torchvision.datasets as datasets
 import torchvision.transforms as transforms
 from tqdm import tqdm
 import os
+from .preprocessing import image_preprocessor
 
 class RobustResNet20(nn.Module):
     def __init__(self, num_classes=10):
@@ -139,15 +140,14 @@ def train_robust_model(epochs=100, batch_size=128, lr=0.1):
     
     return model
 
-def load_model():
+MODEL_NAME = 'robust_cifar10_model'
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'models', f'{MODEL_NAME}.pth')
+
+def load_model(model_path=MODEL_PATH):
     """Load the pre-trained robust CIFAR-10 model"""
     # Initialize model
     model = RobustResNet20()
     
-    # Get the absolute path to the model file
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    model_path = os.path.join(current_dir, '..', '..', 'models', 'robust_cifar10_model.pth')
-    
     # Check if model file exists
     if not os.path.exists(model_path):
         raise FileNotFoundError(
@@ -164,6 +164,7 @@ def load_model():
         state_dict = torch.load(model_path, map_location=device)
         model.load_state_dict(state_dict)
         model = model.to(device)
+        model.eval()
         
         print("Successfully loaded pre-trained robust model")
         return model
@@ -172,19 +173,11 @@ def load_model():
 
 def preprocess_image(image_bytes):
     """Preprocess the image for model input"""
-    # Convert bytes to PIL Image and ensure RGB
-    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    
-    # Define transformations
-    transform = transforms.Compose([
-        transforms.Resize((32, 32)),
-        transforms.ToTensor(),
-        transforms.Normalize((0.4914, 0.4822, 0.4465), (0.2023, 0.1994, 0.2010))
-    ])
-    
-    # Apply transformations
-    image_tensor = transform(image).unsqueeze(0)
-    return image_tensor
+    return torch.from_numpy(image_preprocessor.preprocess(image_bytes))
+
+def preprocess_images(images):
+    """Preprocess a list of images into one (N, 3, 32, 32) batch"""
+    return torch.from_numpy(image_preprocessor.preprocess_batch(images))
 
 def get_predictions(model, image_tensor):
     """Get predictions from the model"""
@@ -199,18 +192,20 @@ def get_class_names():
     return ['airplane', 'automobile', 'bird', 'cat', 'deer',
             'dog', 'frog', 'horse', 'ship', 'truck']
 
-def classify_image(image_bytes):
+def classify_image(image_bytes, model=None):
     """
     Main function to classify an image
     
     Args:
         image_bytes: Image in bytes format
+        model: Warm model borrowed from the model registry, loaded from disk if omitted
     
     Returns:
         list: List of dictionaries containing class names and probabilities
     """
     # Load model
-    model = load_model()
+    if model is None:
+        model = load_model()
     
     # Preprocess image
     image_tensor = preprocess_image(image_bytes)
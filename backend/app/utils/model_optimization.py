@@ -0,0 +1,96 @@
+"""
+This file contains optimized CPU inference variants of the CIFAR-10 models
+"""
+import copy
+from typing import Iterable, List
+
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic, fuse_modules
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+from .preprocessing import IMAGE_SIZE
+
+QUANTIZATION_ENGINE = 'x86'
+
+# Variants that can be built from the fp32 weights at startup; int8_static needs
+# calibration data and is produced offline by test/optimize_models.py. int8_dynamic
+# only quantizes the fc head, so it is bnfold plus an int8 Linear, not an int8 model
+STARTUP_VARIANTS = ('bnfold', 'int8_dynamic')
+MODEL_VARIANTS = STARTUP_VARIANTS + ('int8_static',)
+
+class ChannelsLast(nn.Module):
+    """Runs the wrapped model on channels_last (NHWC) tensors"""
+    def __init__(self, model: nn.Module):
+        super(ChannelsLast, self).__init__()
+        self.model = model.to(memory_format=torch.channels_last)
+
+    def forward(self, x):
+        return self.model(x.contiguous(memory_format=torch.channels_last))
+
+def variant_name(model_name: str, variant: str) -> str:
+    return f"{model_name}_{variant}"
+
+def _conv_bn_pairs(model: nn.Module) -> List[List[str]]:
+    """Find every Conv2d directly followed by a BatchNorm2d in ResNet20 and RobustResNet20"""
+    pairs = []
+    for name, module in model.named_modules():
+        prefix = f"{name}." if name else ""
+        for conv_name, bn_name in (('conv1', 'bn1'), ('conv2', 'bn2')):
+            if isinstance(getattr(module, conv_name, None), nn.Conv2d) and \
+                    isinstance(getattr(module, bn_name, None), nn.BatchNorm2d):
+                pairs.append([prefix + conv_name, prefix + bn_name])
+
+        # Projection shortcuts: downsample / shortcut = Sequential(conv1x1, bn)
+        if isinstance(module, nn.Sequential) and len(module) == 2 and \
+                isinstance(module[0], nn.Conv2d) and isinstance(module[1], nn.BatchNorm2d):
+            pairs.append([prefix + '0', prefix + '1'])
+    return pairs
+
+def fold_batchnorm(model: nn.Module) -> nn.Module:
+    """Return an eval() copy with every BatchNorm folded into its preceding conv"""
+    model = copy.deepcopy(model).cpu().eval()
+    return fuse_modules(model, _conv_bn_pairs(model))
+
+def build_bnfold(model: nn.Module) -> nn.Module:
+    return ChannelsLast(fold_batchnorm(model)).eval()
+
+def build_int8_dynamic(model: nn.Module) -> nn.Module:
+    """bnfold with only the fc head quantized to int8: dynamic quantization has no Conv2d support,
+    so the convs, where ResNet20 spends nearly all its time, stay fp32. Use int8_static for those"""
+    torch.backends.quantized.engine = QUANTIZATION_ENGINE
+    return quantize_dynamic(build_bnfold(model), {nn.Linear}, dtype=torch.qint8).eval()
+
+def build_int8_static(model: nn.Module, calibration_batches: Iterable[torch.Tensor]) -> nn.Module:
+    """Static int8 quantization with activation ranges observed on calibration_batches"""
+    torch.backends.quantized.engine = QUANTIZATION_ENGINE
+    example_inputs = (torch.zeros(1, 3, IMAGE_SIZE, IMAGE_SIZE),)
+
+    prepared = prepare_fx(
+        fold_batchnorm(model),
+        get_default_qconfig_mapping(QUANTIZATION_ENGINE),
+        example_inputs
+    )
+    with torch.no_grad():
+        for batch in calibration_batches:
+            prepared(batch)
+
+    return convert_fx(prepared).eval()
+
+def build_variant(model: nn.Module, variant: str) -> nn.Module:
+    if variant == 'bnfold':
+        return build_bnfold(model)
+    if variant == 'int8_dynamic':
+        return build_int8_dynamic(model)
+    raise ValueError(f"Variant {variant} cannot be built without calibration data")
+
+def save_scripted(model: nn.Module, path: str) -> None:
+    """Persist a variant as frozen TorchScript so it loads without rebuilding"""
+    example = torch.zeros(1, 3, IMAGE_SIZE, IMAGE_SIZE)
+    with torch.no_grad():
+        scripted = torch.jit.freeze(torch.jit.trace(model, example).eval())
+    torch.jit.save(scripted, path)
+
+def load_scripted(path: str) -> nn.Module:
+    torch.backends.quantized.engine = QUANTIZATION_ENGINE
+    return torch.jit.load(path, map_location='cpu').eval()
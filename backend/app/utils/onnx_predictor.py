@@ -0,0 +1,50 @@
+"""
+This file contains the onnxruntime predictor, a torch-free drop-in for get_predictions
+"""
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+
+from ..core.config import settings
+
+ONNX_DIR = Path(__file__).resolve().parent.parent.parent / 'models' / 'onnx'
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+class OnnxPredictor:
+    """CPU onnxruntime session for an exported model with a dynamic batch dimension"""
+
+    def __init__(self, model_path: str,
+                 intra_op_threads: int = settings.ONNX_INTRA_OP_THREADS,
+                 inter_op_threads: int = settings.ONNX_INTER_OP_THREADS,
+                 graph_optimization_level: str = settings.ONNX_GRAPH_OPTIMIZATION_LEVEL):
+        if graph_optimization_level not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(f"Unknown graph optimization level: {graph_optimization_level}")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[graph_optimization_level]
+
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
+
+def get_predictions(predictor: OnnxPredictor, batch: np.ndarray, k: int = 5):
+    """Same contract as utils.model.get_predictions, computed with NumPy"""
+    logits = predictor(np.ascontiguousarray(batch, dtype=np.float32))
+    logits = logits - logits.max(axis=1, keepdims=True)
+    probabilities = np.exp(logits)
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+    top_class = np.argsort(-probabilities, axis=1, kind='stable')[:, :k]
+    top_prob = np.take_along_axis(probabilities, top_class, axis=1)
+    return top_prob, top_class
@@ -0,0 +1,66 @@
+"""
+This file contains keyset (cursor) pagination for newest-first listings
+"""
+import base64
+import enum
+import json
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+
+class TotalMode(str, enum.Enum):
+    exact = "exact"  # count(*) on every call
+    cached = "cached"  # exact count, reused for LISTING_COUNT_TTL_SECONDS
+    approximate = "approximate"  # planner statistics, falls back to cached
+    none = "none"
+
+class Cursor(NamedTuple):
+    timestamp: datetime
+    id: int
+    backwards: bool = False
+
+def encode_cursor(timestamp: datetime, id: int, backwards: bool = False) -> str:
+    payload = json.dumps([timestamp.isoformat(), id, int(backwards)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Cursor:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, id, backwards = json.loads(base64.urlsafe_b64decode(padded))
+        return Cursor(datetime.fromisoformat(timestamp), int(id), bool(backwards))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def paginate(query: Select, timestamp_column, id_column, limit: int,
+             offset: int = 0, cursor: Optional[Cursor] = None) -> Select:
+    """Order newest first on (timestamp, id), seek past the cursor, and fetch one extra row to detect another page"""
+    key = tuple_(timestamp_column, id_column)
+    if cursor is None:
+        return query.order_by(timestamp_column.desc(), id_column.desc()).offset(offset).limit(limit + 1)
+    if cursor.backwards:
+        # Walk towards newer rows; page_cursors restores newest-first order
+        return query.where(key > (cursor.timestamp, cursor.id))\
+            .order_by(timestamp_column.asc(), id_column.asc()).limit(limit + 1)
+    return query.where(key < (cursor.timestamp, cursor.id))\
+        .order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1)
+
+def page_cursors(rows: Sequence, keys: Sequence[Tuple[datetime, int]], limit: int, offset: int = 0,
+                 cursor: Optional[Cursor] = None) -> Tuple[List, Optional[str], Optional[str]]:
+    """Trim the extra row from a paginate() result; returns (rows newest first, next cursor, prev cursor)"""
+    rows, keys = list(rows), list(keys)
+    more = len(rows) > limit
+    rows, keys = rows[:limit], keys[:limit]
+    if cursor is not None and cursor.backwards:
+        rows.reverse()
+        keys.reverse()
+        has_newer, has_older = more, True
+    else:
+        has_newer, has_older = cursor is not None or offset > 0, more
+
+    if not rows:
+        return rows, None, None
+    next_cursor = encode_cursor(*keys[-1]) if has_older else None
+    prev_cursor = encode_cursor(*keys[0], backwards=True) if has_newer else None
+    return rows, next_cursor, prev_cursor
@@ -0,0 +1,15 @@
+"""
+This file contains torch-free helpers for turning model outputs into API predictions
+"""
+
+CIFAR10_CLASSES = ['airplane', 'automobile', 'bird', 'cat', 'deer',
+                   'dog', 'frog', 'horse', 'ship', 'truck']
+
+def format_predictions(top_prob, top_class):
+    """Turn one row of get_predictions output into class name/probability dicts"""
+    return [
+        {
+            "class": CIFAR10_CLASSES[top_class[i].item()],
+            "probability": float(top_prob[i].item())
+        } for i in range(len(top_prob))
+    ]
@@ -0,0 +1,119 @@
+"""
+This file contains the batched image preprocessing pipeline shared by the CIFAR-10 models.
+It only depends on NumPy so onnxruntime workers never need to import torch.
+"""
+import io
+from typing import BinaryIO, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+from ..core.config import settings
+
+CIFAR10_MEAN = (0.4914, 0.4822, 0.4465)
+CIFAR10_STD = (0.2023, 0.1994, 0.2010)
+IMAGE_SIZE = 32
+
+class UnsupportedImageError(ValueError):
+    pass
+
+class ImageTooLargeError(ValueError):
+    pass
+
+class ImagePreprocessor:
+    """Decodes images into a uint8 batch buffer and normalizes the whole batch at once"""
+
+    def __init__(self, size: int = IMAGE_SIZE, mean=CIFAR10_MEAN, std=CIFAR10_STD,
+                 max_pixels: int = settings.MAX_IMAGE_PIXELS,
+                 allowed_formats: Sequence[str] = settings.ALLOWED_IMAGE_FORMATS,
+                 draft_decode: bool = settings.IMAGE_DRAFT_DECODE):
+        self.size = size
+        self.max_pixels = max_pixels
+        self.allowed_formats = {image_format.upper() for image_format in allowed_formats}
+        self.draft_decode = draft_decode
+
+        mean = np.asarray(mean, dtype=np.float32).reshape(1, 1, 1, 3)
+        std = np.asarray(std, dtype=np.float32).reshape(1, 1, 1, 3)
+
+        # (x / 255 - mean) / std folded into a single multiply-subtract
+        self._scale = 1.0 / (255.0 * std)
+        self._shift = mean / std
+
+    def _open(self, image: Union[bytes, BinaryIO]) -> Image.Image:
+        # Image.open only parses the header; pixel data is decoded on load()
+        if isinstance(image, bytes):
+            image = io.BytesIO(image)
+        try:
+            image = Image.open(image)
+        except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+            # PIL's own pixel guard fires in open() for headers far past max_pixels; the warning only
+            # reaches here when warnings are promoted to errors
+            raise ImageTooLargeError(f"Image exceeds the limit of {self.max_pixels} pixels")
+        except (UnidentifiedImageError, OSError):
+            raise UnsupportedImageError("File is not a supported image")
+
+        if image.format not in self.allowed_formats:
+            raise UnsupportedImageError(f"Unsupported image format: {image.format}")
+
+        width, height = image.size
+        if width * height > self.max_pixels:
+            raise ImageTooLargeError(
+                f"Image is {width}x{height} pixels, the limit is {self.max_pixels} pixels"
+            )
+
+        return image
+
+    def probe(self, image: Union[bytes, BinaryIO]) -> Tuple[str, int, int]:
+        """Validate format and dimensions from the header without decoding pixels"""
+        image = self._open(image)
+        return image.format, image.size[0], image.size[1]
+
+    def decode(self, image: Union[bytes, BinaryIO]) -> np.ndarray:
+        """Decode one image to a (size, size, 3) uint8 array"""
+        image = self._open(image)
+
+        reducing_gap = None
+        if self.draft_decode:
+            # JPEGs decode straight at the smallest DCT scale at or above the target,
+            # other formats are box-reduced before the final resample
+            if image.format == "JPEG":
+                image.draft("RGB", (self.size, self.size))
+            reducing_gap = 2.0
+
+        image = image.convert("RGB")
+        image = image.resize((self.size, self.size), Image.BILINEAR, reducing_gap=reducing_gap)
+        return np.asarray(image, dtype=np.uint8)
+
+    def normalize(self, buffer: np.ndarray) -> np.ndarray:
+        """Turn an (N, size, size, 3) uint8 buffer into a normalized float32 (N, 3, size, size) array"""
+        batch = buffer.astype(np.float32)
+        batch *= self._scale
+        batch -= self._shift
+        return np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+
+    def preprocess_batch(self, images: Sequence[Union[bytes, BinaryIO]]) -> np.ndarray:
+        buffer = np.empty((len(images), self.size, self.size, 3), dtype=np.uint8)
+        for i, image in enumerate(images):
+            buffer[i] = self.decode(image)
+        return self.normalize(buffer)
+
+    def preprocess_valid(self, images: Sequence[bytes]) -> Tuple[np.ndarray, List[Optional[str]]]:
+        """Like preprocess_batch, but skips images that fail to decode and reports why per index"""
+        buffer = np.empty((len(images), self.size, self.size, 3), dtype=np.uint8)
+        errors: List[Optional[str]] = []
+        count = 0
+        for image_bytes in images:
+            try:
+                buffer[count] = self.decode(image_bytes)
+            except (ValueError, OSError) as e:
+                errors.append(str(e))
+                continue
+            errors.append(None)
+            count += 1
+        return self.normalize(buffer[:count]), errors
+
+    def preprocess(self, image: Union[bytes, BinaryIO]) -> np.ndarray:
+        return self.preprocess_batch([image])
+
+
+image_preprocessor = ImagePreprocessor()
@@ -0,0 +1,22 @@
+"""
+This file contains preview rendering for stored images
+"""
+import io
+from typing import BinaryIO, Union
+
+from PIL import Image
+
+from ..core.config import settings
+
+def render_thumbnail(image: Union[bytes, BinaryIO], size: int = settings.THUMBNAIL_SIZE,
+                     quality: int = settings.THUMBNAIL_QUALITY) -> bytes:
+    """Downscale to fit in size x size and encode as WebP"""
+    image = Image.open(io.BytesIO(image) if isinstance(image, bytes) else image)
+    if image.format == "JPEG":
+        image.draft("RGB", (size, size))
+    image = image.convert("RGB")
+    image.thumbnail((size, size), Image.LANCZOS, reducing_gap=2.0)
+
+    output = io.BytesIO()
+    image.save(output, "WEBP", quality=quality)
+    return output.getvalue()
@@ -0,0 +1,90 @@
+"""
+This file contains the streaming upload ingest stage
+"""
+import hashlib
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator, BinaryIO
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from ..core.config import settings
+
+class IngestedUpload:
+    """An upload body spooled to memory or disk, with its size and SHA-256 computed while reading"""
+
+    def __init__(self, spool: BinaryIO, size: int, sha256: str, owned: bool = True):
+        self._spool = spool
+        self.size = size
+        self.sha256 = sha256
+        # A borrowed spool (UploadFile.file) is closed by Starlette, not here
+        self._owned = owned
+
+    def open(self) -> BinaryIO:
+        self._spool.seek(0)
+        return self._spool
+
+    def read_bytes(self) -> bytes:
+        return self.open().read()
+
+    def close(self) -> None:
+        if self._owned:
+            self._spool.close()
+
+    def __enter__(self) -> "IngestedUpload":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Upload exceeds the {max_bytes} byte limit"
+    )
+
+async def iter_upload_chunks(file: UploadFile, chunk_size: int = settings.UPLOAD_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+async def ingest_stream(chunks: AsyncIterator[bytes], max_bytes: int = settings.MAX_UPLOAD_BYTES,
+                        spool_bytes: int = settings.UPLOAD_SPOOL_BYTES) -> IngestedUpload:
+    """Hash and spool a chunked body, rejecting it with 413 as soon as it passes max_bytes"""
+    digest = hashlib.sha256()
+    spool = SpooledTemporaryFile(max_size=spool_bytes)
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise _too_large(max_bytes)
+            digest.update(chunk)
+            # Once rolled over to disk, writes go through the threadpool like UploadFile's
+            if spool._rolled:
+                await run_in_threadpool(spool.write, chunk)
+            else:
+                spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+
+    return IngestedUpload(spool, size, digest.hexdigest())
+
+async def ingest_upload(file: UploadFile, max_bytes: int = settings.MAX_UPLOAD_BYTES) -> IngestedUpload:
+    """Hash a multipart file in place; its spool is already bounded, so it is reused rather than copied"""
+    # Multipart parsing already knows the part size, so oversized files are never read
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    digest = hashlib.sha256()
+    size = 0
+    await file.seek(0)
+    async for chunk in iter_upload_chunks(file):
+        size += len(chunk)
+        if size > max_bytes:
+            raise _too_large(max_bytes)
+        digest.update(chunk)
+    return IngestedUpload(file.file, size, digest.hexdigest(), owned=False)
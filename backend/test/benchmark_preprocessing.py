@@ -0,0 +1,70 @@
+"""
+Benchmark per-image preprocessing cost of the legacy per-call transforms.Compose
+against the batched ImagePreprocessor at batch sizes 1-256.
+
+Run from the backend directory:
+    PYTHONPATH=. python test/benchmark_preprocessing.py
+"""
+import io
+import time
+
+import numpy as np
+import torch
+import torchvision.transforms as transforms
+from PIL import Image
+
+from app.utils.preprocessing import ImagePreprocessor, CIFAR10_MEAN, CIFAR10_STD
+
+BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+IMAGE_SIDE = 256
+REPEATS = 3
+
+def make_images(count: int, side: int = IMAGE_SIDE):
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(count):
+        pixels = rng.integers(0, 256, size=(side, side, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+def legacy_preprocess(image_bytes: bytes) -> torch.Tensor:
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    transform = transforms.Compose([
+        transforms.Resize((32, 32)),
+        transforms.ToTensor(),
+        transforms.Normalize(CIFAR10_MEAN, CIFAR10_STD)
+    ])
+    return transform(image).unsqueeze(0)
+
+def best_of(fn, repeats: int = REPEATS) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    preprocessor = ImagePreprocessor(draft_decode=False)
+    draft_preprocessor = ImagePreprocessor(draft_decode=True)
+    images = make_images(max(BATCH_SIZES))
+
+    # With full decode both paths must produce the same tensors
+    legacy = torch.cat([legacy_preprocess(image) for image in images[:8]])
+    batched = torch.from_numpy(preprocessor.preprocess_batch(images[:8]))
+    print(f"max abs difference vs legacy: {(legacy - batched).abs().max().item():.2e}\n")
+
+    print(f"{'batch':>6} {'legacy us/img':>14} {'batched us/img':>15} {'draft us/img':>13} {'speedup':>8}")
+    for batch_size in BATCH_SIZES:
+        batch = images[:batch_size]
+        legacy_time = best_of(lambda: torch.cat([legacy_preprocess(image) for image in batch]))
+        batched_time = best_of(lambda: preprocessor.preprocess_batch(batch))
+        draft_time = best_of(lambda: draft_preprocessor.preprocess_batch(batch))
+        print(f"{batch_size:>6} {legacy_time / batch_size * 1e6:>14.1f} "
+              f"{batched_time / batch_size * 1e6:>15.1f} {draft_time / batch_size * 1e6:>13.1f} "
+              f"{legacy_time / draft_time:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
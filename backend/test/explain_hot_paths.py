@@ -0,0 +1,183 @@
+"""
+EXPLAIN every hot query of the services and fail if one of them falls back to a
+sequential scan of its table, i.e. has no index that matches it.
+
+On PostgreSQL the plans are taken with enable_seqscan off, so a near-empty development
+database still shows which index would serve the query once the tables are large; a
+"Seq Scan" that survives that setting means no usable index exists. On SQLite the
+EXPLAIN QUERY PLAN output is checked for full-table SCAN steps instead.
+
+Run from the backend directory, after `alembic upgrade head`:
+    PYTHONPATH=. python test/explain_hot_paths.py
+    PYTHONPATH=. python test/explain_hot_paths.py --url sqlite:///./app.db --verbose
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, select, text
+
+from app.db.session import engine as default_engine
+from app.models import AuditLog, BaseUser, ClassificationStatusEnum, ImageBlob, ImageClassification
+from app.utils.pagination import Cursor, paginate
+
+CURSOR = Cursor(datetime(2026, 1, 1), 1000)
+
+# Mirrors the statements in app/services; keep them in step when a query changes
+HOT_QUERIES = {
+    "classification history": (
+        "image_classification",
+        select(ImageClassification)
+        .where(ImageClassification.user_id == 1)
+        .order_by(ImageClassification.classification_timestamp.desc())
+        .limit(10)
+    ),
+    "classification history version": (
+        "image_classification",
+        select(func.count(ImageClassification.classification_id), func.max(ImageClassification.classification_id))
+        .where(ImageClassification.user_id == 1)
+    ),
+    "admin classification history": (
+        "image_classification",
+        paginate(
+            select(ImageClassification, BaseUser.username, BaseUser.email)
+            .join(BaseUser, ImageClassification.user_id == BaseUser.user_id),
+            ImageClassification.classification_timestamp, ImageClassification.classification_id, 10
+        )
+    ),
+    "admin classification history, next page": (
+        "image_classification",
+        paginate(
+            select(ImageClassification, BaseUser.username, BaseUser.email)
+            .join(BaseUser, ImageClassification.user_id == BaseUser.user_id),
+            ImageClassification.classification_timestamp, ImageClassification.classification_id, 10, cursor=CURSOR
+        )
+    ),
+    "result cache lookup": (
+        "image_classification",
+        select(ImageClassification)
+        .where(
+            ImageClassification.image_hash == "0" * 64,
+            ImageClassification.model_used == "resnet50",
+            ImageClassification.model_version == "0" * 12,
+            ImageClassification.top_prediction.isnot(None),
+            ImageClassification.status != ClassificationStatusEnum.error
+        )
+        .order_by(ImageClassification.classification_id.desc())
+        .limit(1)
+    ),
+    "result cache batch lookup": (
+        "image_classification",
+        select(ImageClassification.image_hash, ImageClassification.top_prediction, ImageClassification.confidence_score)
+        .where(ImageClassification.classification_id.in_(
+            select(func.max(ImageClassification.classification_id))
+            .where(
+                ImageClassification.image_hash.in_(["0" * 64, "1" * 64]),
+                ImageClassification.model_used == "resnet50",
+                ImageClassification.model_version == "0" * 12,
+            ImageClassification.model_version == "0" * 12,
+                ImageClassification.top_prediction.isnot(None),
+                ImageClassification.status != ClassificationStatusEnum.error
+            )
+            .group_by(ImageClassification.image_hash)
+        ))
+    ),
+    "segment compaction repoint": (
+        "image_classification",
+        select(ImageClassification.classification_id)
+        .where(ImageClassification.image_path == "segment:0.seg:8:100")
+    ),
+    "audit log listing": (
+        "audit_log",
+        paginate(
+            select(AuditLog, BaseUser).outerjoin(BaseUser, AuditLog.user_id == BaseUser.user_id),
+            AuditLog.timestamp, AuditLog.log_id, 10
+        )
+    ),
+    "audit log listing, previous page": (
+        "audit_log",
+        paginate(
+            select(AuditLog, BaseUser).outerjoin(BaseUser, AuditLog.user_id == BaseUser.user_id),
+            AuditLog.timestamp, AuditLog.log_id, 10, cursor=CURSOR._replace(backwards=True)
+        )
+    ),
+    "audit log version": (
+        "audit_log",
+        select(func.max(AuditLog.log_id))
+    ),
+    "login by username": (
+        "base_user",
+        select(BaseUser).where(BaseUser.username == "admin")
+    ),
+    "blob by path": (
+        "image_blob",
+        select(ImageBlob).where(ImageBlob.image_path == "ab/cd/0.enc")
+    ),
+}
+
+# SQLite's LIKE is case-insensitive, so only PostgreSQL can serve this one from an index
+POSTGRES_ONLY = {
+    "segment blobs": (
+        "image_blob",
+        select(ImageBlob).where(ImageBlob.image_path.like("segment:0.seg:%"))
+    ),
+}
+
+def _postgres_plan(conn, sql: str) -> list:
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    nodes, stack = [], [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        nodes.append((node["Node Type"], node.get("Relation Name"), node.get("Index Name")))
+        stack.extend(node.get("Plans", []))
+    return nodes
+
+def _sqlite_plan(conn, sql: str) -> list:
+    nodes = []
+    for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")):
+        detail = row[-1]
+        # Older SQLite versions print "SCAN TABLE <name>"
+        words = [word for word in detail.split() if word != "TABLE"]
+        table = words[1] if words[0] in ("SCAN", "SEARCH") else None
+        full_scan = words[0] == "SCAN" and "INDEX" not in detail
+        nodes.append(("Seq Scan" if full_scan else words[0], table, detail))
+    return nodes
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that every hot query is served by an index")
+    parser.add_argument("--url", help="Database URL (defaults to settings.DATABASE_URL)")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan node")
+    args = parser.parse_args()
+
+    bind = create_engine(args.url) if args.url else default_engine
+    postgres = bind.dialect.name == "postgresql"
+    queries = dict(HOT_QUERIES, **POSTGRES_ONLY) if postgres else HOT_QUERIES
+
+    failures = 0
+    with bind.connect() as conn:
+        if postgres:
+            conn.execute(text("SET enable_seqscan = off"))
+
+        for name, (table, query) in queries.items():
+            sql = str(query.compile(bind, compile_kwargs={"literal_binds": True}))
+            nodes = _postgres_plan(conn, sql) if postgres else _sqlite_plan(conn, sql)
+            seq_scans = [node for node in nodes if node[0] == "Seq Scan" and node[1] == table]
+            indexes = sorted({node[2] for node in nodes if node[2] and node[1] == table}) if postgres else \
+                [node[2] for node in nodes if node[1] == table and node[0] != "Seq Scan"]
+
+            failures += bool(seq_scans)
+            print(f"{'FAIL' if seq_scans else 'ok  '} {name}: "
+                  f"{'sequential scan of ' + table if seq_scans else ', '.join(indexes) or 'no scan of ' + table}")
+            if args.verbose:
+                for node in nodes:
+                    print(f"       {node}")
+
+    print(f"{len(queries) - failures}/{len(queries)} hot queries use an index")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Export every model in backend/models to backend/models/onnx/<model>.onnx with a
+dynamic batch dimension, then check onnxruntime output against eager PyTorch.
+
+Set INFERENCE_BACKEND=onnxruntime to serve the exported models.
+
+Run from the backend directory:
+    PYTHONPATH=. python test/export_onnx.py
+    PYTHONPATH=. python test/export_onnx.py --variants bnfold
+"""
+import argparse
+
+import numpy as np
+import torch
+
+from app.services.model_registry import ModelRegistry
+from app.utils.inference_backend import export_onnx, measure_latency_ms
+from app.utils.onnx_predictor import ONNX_DIR, OnnxPredictor
+from app.utils.model_optimization import STARTUP_VARIANTS
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", nargs="*", default=[], choices=STARTUP_VARIANTS,
+                        help="also export these optimized variants")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    registry = ModelRegistry(variants=args.variants, backend='eager')
+    registry.load_all()
+    ONNX_DIR.mkdir(parents=True, exist_ok=True)
+
+    batch = np.random.default_rng(0).standard_normal((32, 3, 32, 32), dtype=np.float32)
+    print(f"\n{'model':<36} {'max abs diff':>12} {'b1 ms':>8} {'b32 ms':>8}")
+    for name, _ in registry.list_models():
+        model = registry.get(name)
+        path = ONNX_DIR / f"{name}.onnx"
+        export_onnx(model, str(path), opset_version=args.opset)
+
+        predictor = OnnxPredictor(str(path))
+        with torch.no_grad():
+            expected = model(torch.from_numpy(batch)).numpy()
+        difference = np.abs(predictor(batch) - expected).max()
+        print(f"{name:<36} {difference:>12.2e} "
+              f"{measure_latency_ms(lambda x: predictor(x.numpy()), 1):>8.2f} "
+              f"{measure_latency_ms(lambda x: predictor(x.numpy()), 32):>8.2f}")
+
+    print(f"\nSaved ONNX models to {ONNX_DIR}")
+
+if __name__ == "__main__":
+    main()
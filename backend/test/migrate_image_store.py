@@ -0,0 +1,132 @@
+"""
+Move flat storage/images/{hash}_{id}.enc files into the sharded, content-addressed
+layout (storage/images/ab/cd/<blob key>.enc) and rewrite ImageClassification.image_path.
+
+Rows of one user with the same image hash end up sharing a single blob. Legacy Fernet
+files are re-encrypted into the envelope format only when no envelope copy exists.
+File moves run in parallel; each group's rows are committed before the files it
+replaced are deleted, so an interrupted run can simply be started again.
+
+IMAGE_MASTER_KEY must be set first (see backend/README.md): new envelope copies are
+wrapped under it, while legacy files are still decrypted with the key derived from
+the owner's row and the file's salt.
+
+Run from the backend directory:
+    PYTHONPATH=. python test/migrate_image_store.py --dry-run
+    PYTHONPATH=. python test/migrate_image_store.py --workers 16
+"""
+import argparse
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from app.db.session import SessionLocal
+from app.models.base_user import BaseUser
+from app.models.image_blob import ImageBlob
+from app.models.image_classification import ImageClassification
+from app.services.encryption_service import EncryptionService
+from app.services.image_storage_service import ImageStorageService, blob_key, blob_path
+from app.services.storage_io import storage_io
+
+COMMIT_EVERY = 500
+
+def plan_groups(db, storage_path: Path) -> Dict[Tuple[int, str], List[ImageClassification]]:
+    """Rows still stored in the flat layout, grouped by owner and content hash"""
+    groups = defaultdict(list)
+    rows = db.query(ImageClassification).filter(ImageClassification.image_path.isnot(None)).all()
+    for row in rows:
+        if Path(row.image_path).parent == storage_path:
+            groups[(row.user_id, row.image_hash)].append(row)
+    return groups
+
+def migrate_group(storage_path: Path, user_id: int, image_hash: str, rows: List[Tuple[str, str]]) -> Tuple[str, int]:
+    """Materialize one blob for the group and return (blob path, size). Never deletes anything."""
+    target = blob_path(storage_path, blob_key(user_id, image_hash))
+    if target.exists():
+        return str(target), target.stat().st_size
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    envelope = [path for path, salt in rows if not salt and os.path.exists(path)]
+    if envelope:
+        # Same filesystem, so this is a cheap link; the flat file goes once rows are committed
+        os.link(envelope[0], target)
+        return str(target), target.stat().st_size
+
+    # Only legacy copies exist: decrypt one and write it back in the envelope format
+    path, _ = next(row for row in rows if os.path.exists(row[0]))
+    db = SessionLocal()
+    try:
+        encryption = EncryptionService()
+        with open(path, 'rb') as f:
+            stored = f.read()
+        image_bytes = encryption.decrypt_legacy_image(stored[16:], db.get(BaseUser, user_id), stored[:16])
+        storage_io.write_atomic(target, encryption.encrypt_image_chunks(image_bytes, user_id))
+    finally:
+        db.close()
+    return str(target), target.stat().st_size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be moved")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        storage_path = ImageStorageService(db).storage_path
+        groups = plan_groups(db, storage_path)
+        total_rows = sum(len(rows) for rows in groups.values())
+        print(f"{total_rows} rows in the flat layout, {len(groups)} distinct blobs after dedup")
+        if args.dry_run or not groups:
+            return
+
+        start = time.perf_counter()
+        replaced: List[str] = []
+        done = 0
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            futures = {
+                pool.submit(
+                    migrate_group, storage_path, user_id, image_hash,
+                    [(row.image_path, row.encryption_salt) for row in rows]
+                ): (user_id, image_hash)
+                for (user_id, image_hash), rows in groups.items()
+            }
+            for future in as_completed(futures):
+                user_id, image_hash = futures[future]
+                try:
+                    target, size = future.result()
+                except Exception as e:
+                    print(f"Failed to migrate blob for user {user_id}, hash {image_hash}: {str(e)}")
+                    continue
+
+                key = blob_key(user_id, image_hash)
+                blob = db.get(ImageBlob, key)
+                if blob is None:
+                    blob = ImageBlob(blob_key=key, user_id=user_id, image_path=target, file_size=size, ref_count=0)
+                    db.add(blob)
+                for row in groups[(user_id, image_hash)]:
+                    replaced.append(row.image_path)
+                    row.image_path = target
+                    row.encryption_salt = None
+                    blob.ref_count += 1
+
+                done += 1
+                if done % COMMIT_EVERY == 0:
+                    db.commit()
+                    for path in replaced:
+                        Path(path).unlink(missing_ok=True)
+                    replaced = []
+                    print(f"  {done}/{len(groups)} blobs")
+
+        db.commit()
+        for path in replaced:
+            Path(path).unlink(missing_ok=True)
+        print(f"Migrated {total_rows} rows into {done} blobs in {time.perf_counter() - start:.1f}s")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
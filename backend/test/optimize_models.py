@@ -0,0 +1,130 @@
+"""
+Build the optimized inference variants of every model in backend/models, calibrate
+the static int8 variant against stored images and report accuracy delta and latency.
+
+The calibrated int8_static variant is saved as backend/models/<model>_int8_static.pt,
+and is loaded at startup when MODEL_VARIANTS includes "int8_static".
+
+Run from the backend directory:
+    PYTHONPATH=. python test/optimize_models.py --from-storage 512
+    PYTHONPATH=. python test/optimize_models.py --images-dir ./calibration --cifar10-root ./data
+"""
+import argparse
+import asyncio
+import time
+from pathlib import Path
+from typing import List
+
+import torch
+
+from app.services.model_registry import ModelRegistry, MODELS_DIR
+from app.utils.model_optimization import (
+    STARTUP_VARIANTS, build_variant, build_int8_static, save_scripted, variant_name
+)
+from app.utils.preprocessing import image_preprocessor, CIFAR10_MEAN, CIFAR10_STD
+
+BATCH_SIZE = 32
+LATENCY_REPEATS = 50
+
+def load_stored_images(count: int) -> List[bytes]:
+    """Decrypt the most recent stored uploads through the normal storage service"""
+    from sqlalchemy import select
+    from app.db.session import AsyncSessionLocal
+    from app.models.image_classification import ImageClassification
+    from app.services.image_storage_service import ImageStorageService
+
+    async def load() -> List[bytes]:
+        async with AsyncSessionLocal() as db:
+            classification_ids = (await db.scalars(
+                select(ImageClassification.classification_id)
+                .where(ImageClassification.image_path.isnot(None))
+                .order_by(ImageClassification.classification_id.desc())
+                .limit(count)
+            )).all()
+            storage = ImageStorageService(db)
+            return [await storage.read_image(classification_id) for classification_id in classification_ids]
+
+    return asyncio.run(load())
+
+def load_directory_images(images_dir: str, count: int) -> List[bytes]:
+    paths = sorted(p for p in Path(images_dir).iterdir() if p.is_file())[:count]
+    return [p.read_bytes() for p in paths]
+
+def to_batches(images: List[bytes]) -> List[torch.Tensor]:
+    return [
+        torch.from_numpy(image_preprocessor.preprocess_batch(images[i:i + BATCH_SIZE]))
+        for i in range(0, len(images), BATCH_SIZE)
+    ]
+
+def load_cifar10_test(root: str, count: int):
+    import torchvision.datasets as datasets
+    import torchvision.transforms as transforms
+
+    transform = transforms.Compose([transforms.ToTensor(), transforms.Normalize(CIFAR10_MEAN, CIFAR10_STD)])
+    testset = datasets.CIFAR10(root=root, train=False, download=True, transform=transform)
+    inputs = torch.stack([testset[i][0] for i in range(count)])
+    labels = torch.tensor([testset[i][1] for i in range(count)])
+    return list(inputs.split(BATCH_SIZE)), labels
+
+def top1(model, batches: List[torch.Tensor]) -> torch.Tensor:
+    with torch.no_grad():
+        return torch.cat([model(batch).argmax(dim=1) for batch in batches])
+
+def latency_ms(model, batch_size: int) -> float:
+    batch = torch.randn(batch_size, 3, 32, 32)
+    with torch.no_grad():
+        for _ in range(5):
+            model(batch)
+        start = time.perf_counter()
+        for _ in range(LATENCY_REPEATS):
+            model(batch)
+    return (time.perf_counter() - start) / LATENCY_REPEATS * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--from-storage", type=int, metavar="N", help="calibrate on the N most recent stored images")
+    source.add_argument("--images-dir", help="calibrate on plain image files in this directory")
+    parser.add_argument("--count", type=int, default=512, help="max images read from --images-dir")
+    parser.add_argument("--cifar10-root", help="report labeled accuracy on the CIFAR-10 test set")
+    parser.add_argument("--eval-count", type=int, default=2000)
+    args = parser.parse_args()
+
+    images = load_stored_images(args.from_storage) if args.from_storage else \
+        load_directory_images(args.images_dir, args.count)
+    if not images:
+        raise SystemExit("No calibration images found")
+    calibration = to_batches(images)
+    print(f"Calibrating on {len(images)} images\n")
+
+    if args.cifar10_root:
+        eval_batches, labels = load_cifar10_test(args.cifar10_root, args.eval_count)
+    else:
+        eval_batches, labels = calibration, None
+
+    registry = ModelRegistry(variants=[], backend='eager')
+    registry.load_all()
+
+    print(f"\n{'model':<42} {'top1 agree':>10} {'accuracy':>9} {'b1 ms':>8} {'b32 ms':>8}")
+    for name, _ in registry.list_models():
+        model = registry.get(name)
+        variants = {name: model}
+        for variant in STARTUP_VARIANTS:
+            variants[variant_name(name, variant)] = build_variant(model, variant)
+
+        static_name = variant_name(name, 'int8_static')
+        variants[static_name] = build_int8_static(model, calibration)
+        save_scripted(variants[static_name], str(MODELS_DIR / f"{static_name}.pt"))
+
+        reference = top1(model, eval_batches)
+        for label, candidate in variants.items():
+            predicted = top1(candidate, eval_batches)
+            agreement = (predicted == reference).float().mean().item() * 100
+            accuracy = f"{(predicted == labels).float().mean().item() * 100:8.2f}%" if labels is not None else f"{'-':>9}"
+            print(f"{label:<42} {agreement:>9.2f}% {accuracy} "
+                  f"{latency_ms(candidate, 1):>8.2f} {latency_ms(candidate, BATCH_SIZE):>8.2f}")
+
+    print(f"\nSaved calibrated int8_static variants to {MODELS_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -109,6 +109,7 @@ const ClassificationInterface: React.FC<ClassificationInterfaceProps> = ({
   const [isLoading, setIsLoading] = useState(false);
   const [imageUrls, setImageUrls] = useState<Record<string, string>>({});
   const [selectedHistoryItem, setSelectedHistoryItem] = useState<ClassificationHistory | null>(null);
+  const [detailImageUrl, setDetailImageUrl] = useState<string | null>(null);
   const theme = useTheme();
 
   const handleImageUpload = (event: React.ChangeEvent<HTMLInputElement>) => {
@@ -135,21 +136,25 @@ const ClassificationInterface: React.FC<ClassificationInterfaceProps> = ({
     }
   };
 
+  const fetchObjectUrl = async (url: string) => {
+    const token = localStorage.getItem('token');
+    const response = await fetch(url, {
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+    
+    if (!response.ok) {
+      throw new Error('Failed to fetch image');
+    }
+    
+    const blob = await response.blob();
+    return URL.createObjectURL(blob);
+  };
+
   const fetchImage = async (url: string, id: string) => {
     try {
-      const token = localStorage.getItem('token');
-      const response = await fetch(url, {
-        headers: {
-          'Authorization': `Bearer ${token}`,
-        },
-      });
-      
-      if (!response.ok) {
-        throw new Error('Failed to fetch image');
-      }
-      
-      const blob = await response.blob();
-      const objectUrl = URL.createObjectURL(blob);
+      const objectUrl = await fetchObjectUrl(url);
       setImageUrls(prev => ({ ...prev, [id]: objectUrl }));
     } catch (error) {
       console.error('Error fetching image:', error);
@@ -164,14 +169,43 @@ const ClassificationInterface: React.FC<ClassificationInterfaceProps> = ({
   }, []);
 
   useEffect(() => {
-    // Fetch images for history items
+    // Fetch small previews for history items instead of the full uploads;
+    // items classified in this session already point at the local file
     history.forEach(item => {
       if (!imageUrls[item.id]) {
-        fetchImage(item.imageUrl, item.id);
+        fetchImage(item.imageUrl.startsWith('blob:') ? item.imageUrl : `${item.imageUrl}/thumbnail`, item.id);
       }
     });
   }, [history]);
 
+  useEffect(() => {
+    // The details card shows the full image; thumbnails are only sized for the list cells
+    if (!selectedHistoryItem) {
+      return;
+    }
+
+    let objectUrl: string | null = null;
+    let cancelled = false;
+    fetchObjectUrl(selectedHistoryItem.imageUrl)
+      .then(url => {
+        if (cancelled) {
+          URL.revokeObjectURL(url);
+          return;
+        }
+        objectUrl = url;
+        setDetailImageUrl(url);
+      })
+      .catch(error => console.error('Error fetching image:', error));
+
+    return () => {
+      cancelled = true;
+      if (objectUrl) {
+        URL.revokeObjectURL(objectUrl);
+      }
+      setDetailImageUrl(null);
+    };
+  }, [selectedHistoryItem]);
+
   const getStatusIcon = (status: string) => {
     switch(status) {
       case 'success':
@@ -398,10 +432,10 @@ const ClassificationInterface: React.FC<ClassificationInterfaceProps> = ({
       {selectedHistoryItem ? (
         <Box>
           <Card sx={{ mb: 3, overflow: 'hidden' }}>
-            {imageUrls[selectedHistoryItem.id] ? (
+            {detailImageUrl ? (
               <CardMedia
                 component="img"
-                image={imageUrls[selectedHistoryItem.id]}
+                image={detailImageUrl}
                 alt="History"
                 sx={{ 
                   maxHeight: '300px', 